@@ -0,0 +1,10 @@
+from src.common.metrics import metrics
+
+
+def on_starting(server):
+    # Metric files from earlier runs would be counted again.
+    metrics.reset()
+
+
+def child_exit(server, worker):
+    metrics.retire(worker.pid)
@@ -0,0 +1,2 @@
+#!/usr/bin/bash
+python -m src.api
@@ -1,3 +1,5 @@
 #!/usr/bin/bash
 #python -m src.backend
-gunicorn -w 4 --bind 0.0.0.0:5000 'src.backend.__main__:app'
+# Threads let concurrent requests in one worker share a single query.
+# The config clears and retires the per-worker metric files.
+gunicorn -c scripts/gunicorn.conf.py -w 4 --threads 4 --bind 0.0.0.0:5000 'src.backend.__main__:app'
@@ -0,0 +1,13 @@
+from os import getenv
+
+import uvicorn
+from dotenv import load_dotenv
+
+load_dotenv()
+
+API_HOST = getenv("API_HOST", "0.0.0.0")
+API_PORT = int(getenv("API_PORT", "8000"))
+API_WORKERS = int(getenv("API_WORKERS", "1"))
+
+if __name__ == "__main__":
+	uvicorn.run("src.api.app:app", host=API_HOST, port=API_PORT, workers=API_WORKERS)
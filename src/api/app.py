@@ -0,0 +1,172 @@
+import json
+from os import getenv
+from urllib.parse import parse_qs
+
+from dotenv import load_dotenv
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from src.common.period import parse_period
+from src.db import DatasetCatalog, SerializableTable, to_records
+from src.db.household import HouseholdLoans, HouseholdTermDeposits
+from src.db.non_financial import (
+	NonFinancialLoans,
+	NonFinancialTermDeposits,
+	NonFinancialTermDepositsBySize,
+)
+
+load_dotenv()
+DATABASE_URL = f"postgresql+asyncpg://{getenv('POSTGRES_USER')}:{getenv('POSTGRES_PASSWORD')}@{getenv('POSTGRES_HOST')}:{getenv('POSTGRES_PORT')}/{getenv('POSTGRES_DB')}"
+API_POOL_SIZE = int(getenv("API_POOL_SIZE", "10"))
+API_MAX_POINTS = int(getenv("API_MAX_POINTS", "1000"))
+RESOLUTIONS = {"month": 1, "quarter": 3, "year": 12}
+
+TABLES: dict[str, type[SerializableTable]] = {
+	table.__tablename__: table
+	for table in (
+		HouseholdLoans,
+		HouseholdTermDeposits,
+		NonFinancialLoans,
+		NonFinancialTermDeposits,
+		NonFinancialTermDepositsBySize,
+	)
+}
+
+engine = create_async_engine(DATABASE_URL, pool_size=API_POOL_SIZE)
+
+
+class ApiError(Exception):
+	def __init__(self, status: int, message: str):
+		super().__init__(message)
+		self.status = status
+
+
+def get_period(query: dict[str, str], name: str) -> tuple[int, int] | None:
+	if name not in query:
+		return None
+	try:
+		return parse_period(query[name])
+	except ValueError:
+		raise ApiError(400, f"'{name}' must be a valid YYYY-MM period")
+
+
+def parse_int(value: str, name: str) -> int:
+	try:
+		return int(value)
+	except ValueError:
+		raise ApiError(400, f"'{name}' must be an integer")
+
+
+def describe(series: dict[int, tuple]) -> dict:
+	years = sorted(series)
+	return {
+		"first": [years[0], series[years[0]][0]],
+		"last": [years[-1], series[years[-1]][1]],
+		"years": years,
+	}
+
+
+def get_table(name: str) -> type[SerializableTable]:
+	table = TABLES.get(name)
+	if table is None:
+		raise ApiError(404, f"Unknown table '{name}'")
+	return table
+
+
+async def list_tables(session: AsyncSession) -> dict:
+	catalog = await DatasetCatalog.get_async(session)
+	return {
+		name: {
+			purpose: describe(series)
+			for purpose, series in catalog.get(name, {}).items()
+		}
+		for name in TABLES
+	}
+
+
+async def get_series(
+	session: AsyncSession, name: str, purpose_name: str, query: dict[str, str]
+) -> dict:
+	table = get_table(name)
+	purpose = table.__table__.c.purpose.type.enum_class.__members__.get(purpose_name)
+	series = (await DatasetCatalog.get_async(session)).get(name, {}).get(purpose_name)
+	if purpose is None or not series:
+		raise ApiError(404, f"No data for '{name}/{purpose_name}'")
+
+	described = describe(series)
+	start = get_period(query, "start") or tuple(described["first"])
+	end = get_period(query, "end") or tuple(described["last"])
+
+	resolution = RESOLUTIONS.get(query.get("resolution", "month"))
+	if resolution is None:
+		raise ApiError(400, f"'resolution' must be one of {list(RESOLUTIONS)}")
+	max_points = parse_int(query.get("max_points", API_MAX_POINTS), "max_points")
+	max_points = min(max(max_points, 1), API_MAX_POINTS)
+
+	data = await table.get_range_async(
+		session, purpose, start, end, resolution, max_points
+	)
+	return {
+		"table": name,
+		"purpose": purpose_name,
+		"start": list(start),
+		"end": list(end),
+		"columns": list(data.columns),
+		"data": to_records(data, list(data.columns)),
+	}
+
+
+async def route(path: str, query: dict[str, str]) -> dict:
+	async with AsyncSession(engine) as session:
+		match path.strip("/").split("/"):
+			case ["tables"]:
+				return await list_tables(session)
+			case ["tables", name]:
+				get_table(name)
+				return (await list_tables(session))[name]
+			case ["tables", name, purpose]:
+				return await get_series(session, name, purpose, query)
+	raise ApiError(404, "Not found")
+
+
+async def send_json(send, status: int, body):
+	payload = json.dumps(body).encode()
+	await send(
+		{
+			"type": "http.response.start",
+			"status": status,
+			"headers": [
+				(b"content-type", b"application/json"),
+				(b"content-length", str(len(payload)).encode()),
+			],
+		}
+	)
+	await send({"type": "http.response.body", "body": payload})
+
+
+async def app(scope, receive, send):
+	if scope["type"] == "lifespan":
+		while True:
+			message = await receive()
+			if message["type"] == "lifespan.startup":
+				await send({"type": "lifespan.startup.complete"})
+			elif message["type"] == "lifespan.shutdown":
+				await engine.dispose()
+				await send({"type": "lifespan.shutdown.complete"})
+				return
+
+	if scope["type"] != "http":
+		return
+	if scope["method"] != "GET":
+		await send_json(send, 405, {"error": "Method not allowed"})
+		return
+
+	query = {
+		key: values[-1]
+		for key, values in parse_qs(scope["query_string"].decode()).items()
+	}
+	try:
+		body = await route(scope["path"], query)
+	except ApiError as error:
+		await send_json(send, error.status, {"error": str(error)})
+		return
+	await send_json(send, 200, body)
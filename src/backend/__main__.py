@@ -5,6 +5,10 @@ from flask.cli import load_dotenv
 from flask_sqlalchemy import SQLAlchemy
 
 from src.backend.config import Config
+from src.backend.database import create_status
+from src.backend.export import create_export
+from src.backend.metrics import create_metrics
+from src.common.metrics import metrics
 from src.db import Base
 from src.frontend.app import create_dash
 
@@ -17,8 +21,12 @@ db = SQLAlchemy(model_class=Base)
 db.init_app(app)
 
 create_dash(app, db)
+app.register_blueprint(create_export(db))
+app.register_blueprint(create_status(db))
+app.register_blueprint(create_metrics(db))
 
 DEBUG = str(getenv("FLASK_DEBUG", False)).lower() in ('true', '1', 't')
 
 if __name__ == "__main__":
+	metrics.reset()
 	app.run(debug=DEBUG)
@@ -2,8 +2,11 @@ from os import getenv
 
 from dotenv import load_dotenv
 
+from src.backend.database import engine_options, snapshot_uri
+
 load_dotenv()
 
 class Config:
-    SQLALCHEMY_DATABASE_URI = f"postgresql://{getenv('POSTGRES_USER')}:{getenv('POSTGRES_PASSWORD')}@{getenv('POSTGRES_HOST')}:{getenv('POSTGRES_PORT')}/{getenv('POSTGRES_DB')}"
+    SQLALCHEMY_DATABASE_URI = snapshot_uri() or f"postgresql://{getenv('POSTGRES_USER')}:{getenv('POSTGRES_PASSWORD')}@{getenv('POSTGRES_HOST')}:{getenv('POSTGRES_PORT')}/{getenv('POSTGRES_DB')}"
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options()
     SQLALCHEMY_TRACK_MODIFICATIONS = False
@@ -0,0 +1,126 @@
+import threading
+from os import getenv
+from pathlib import Path
+from time import perf_counter
+
+from dotenv import load_dotenv
+from flask import Blueprint
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.exc import TimeoutError
+from sqlalchemy.pool import QueuePool
+
+load_dotenv()
+
+DB_POOL_SIZE = int(getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(getenv("DB_MAX_OVERFLOW", "5"))
+DB_POOL_TIMEOUT = float(getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = getenv("DB_POOL_PRE_PING", "true").lower() in ("true", "1", "t")
+DB_STATEMENT_TIMEOUT_MS = int(getenv("DB_STATEMENT_TIMEOUT_MS", "15000"))
+DB_SESSION_MODE = getenv("DB_SESSION_MODE", "readonly")
+SESSION_MODES = ("readonly", "autocommit", "readwrite")
+DB_SNAPSHOT = getenv("DB_SNAPSHOT")
+
+
+class PoolMetrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def record(self, seconds: float, timed_out: bool = False):
+        with self.lock:
+            self.checkouts += not timed_out
+            self.timeouts += timed_out
+            self.wait_seconds += seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+
+
+class MeteredQueuePool(QueuePool):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def _do_get(self):
+        start = perf_counter()
+        try:
+            connection = super()._do_get()
+        except TimeoutError:
+            self.metrics.record(perf_counter() - start, timed_out=True)
+            raise
+        self.metrics.record(perf_counter() - start)
+        return connection
+
+
+def snapshot_uri() -> str | None:
+    if not DB_SNAPSHOT:
+        return None
+    path = Path(DB_SNAPSHOT).resolve()
+    if not path.is_file():
+        raise FileNotFoundError(f"DB_SNAPSHOT file not found: {path}")
+    # Opened read-only, and immutable so SQLite skips file locking.
+    return f"sqlite:///file:{path.as_posix()}?mode=ro&immutable=1&uri=true"
+
+
+def engine_options() -> dict:
+    if DB_SESSION_MODE not in SESSION_MODES:
+        raise ValueError(f"DB_SESSION_MODE must be one of {SESSION_MODES}")
+
+    if DB_SNAPSHOT:
+        return {
+            "poolclass": MeteredQueuePool,
+            "pool_size": DB_POOL_SIZE,
+            "max_overflow": DB_MAX_OVERFLOW,
+            "pool_timeout": DB_POOL_TIMEOUT,
+            "connect_args": {"check_same_thread": False},
+        }
+
+    options = [f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"]
+    if DB_SESSION_MODE != "readwrite":
+        options.append("-c default_transaction_read_only=on")
+
+    engine_options = {
+        "poolclass": MeteredQueuePool,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+        "connect_args": {"options": " ".join(options)},
+    }
+    if DB_SESSION_MODE == "autocommit":
+        # Dashboard reads are single statements, so skip BEGIN/COMMIT.
+        engine_options["isolation_level"] = "AUTOCOMMIT"
+    return engine_options
+
+
+def pool_metrics(db: SQLAlchemy) -> dict:
+    pool = db.engine.pool
+    metrics = {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        "max_overflow": DB_MAX_OVERFLOW,
+    }
+    if isinstance(pool, MeteredQueuePool):
+        with pool.metrics.lock:
+            metrics.update(
+                checkouts=pool.metrics.checkouts,
+                timeouts=pool.metrics.timeouts,
+                wait_seconds_total=pool.metrics.wait_seconds,
+                wait_seconds_max=pool.metrics.max_wait_seconds,
+            )
+    return metrics
+
+
+def create_status(db: SQLAlchemy) -> Blueprint:
+    status = Blueprint("status", __name__, url_prefix="/status")
+
+    @status.get("/pool")
+    def get_pool():
+        return pool_metrics(db)
+
+    return status
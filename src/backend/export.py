@@ -0,0 +1,152 @@
+import csv
+import hashlib
+import io
+from collections.abc import Iterator
+from os import getenv
+
+import pyarrow
+import sqlalchemy
+from flask import Blueprint, Response, abort, request
+from flask_sqlalchemy import SQLAlchemy
+from pyarrow import parquet
+
+from src.common.period import parse_period
+from src.db import DatasetCatalog, EtlMetadata
+from src.db.analytics import DerivedSeries
+from src.frontend.type.table_type import TableTypes
+
+EXPORT_CHUNK_ROWS = int(getenv("EXPORT_CHUNK_ROWS", "5000"))
+FORMATS = {
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+    "csv": "text/csv; charset=utf-8",
+}
+
+# Derived series are computed per request and have no catalog entries.
+TABLES = {
+    table_type.value.table.__tablename__: table_type.value
+    for table_type in TableTypes
+    if not issubclass(table_type.value.table, DerivedSeries)
+}
+
+
+def arrow_type(column: sqlalchemy.ColumnElement) -> pyarrow.DataType:
+    if isinstance(column.type, sqlalchemy.Integer):
+        return pyarrow.int64()
+    if isinstance(column.type, sqlalchemy.Float):
+        return pyarrow.float64()
+    return pyarrow.string()
+
+
+def drain(sink: io.BytesIO) -> bytes:
+    data = sink.getvalue()
+    sink.seek(0)
+    sink.truncate()
+    return data
+
+
+def write_csv(columns: list[str], partitions) -> Iterator[bytes]:
+    sink = io.StringIO()
+    writer = csv.writer(sink)
+    writer.writerow(columns)
+    for rows in partitions:
+        writer.writerows(rows)
+        yield sink.getvalue().encode()
+        sink.seek(0)
+        sink.truncate()
+    # Empty ranges still get the header row.
+    if sink.tell():
+        yield sink.getvalue().encode()
+
+
+def write_arrow(
+        schema: pyarrow.Schema, partitions, file_format: str
+) -> Iterator[bytes]:
+    sink = io.BytesIO()
+    if file_format == "parquet":
+        writer = parquet.ParquetWriter(sink, schema)
+    else:
+        writer = pyarrow.ipc.new_stream(sink, schema)
+
+    for rows in partitions:
+        batch = pyarrow.RecordBatch.from_arrays(
+            [
+                pyarrow.array(values, type=field.type)
+                for values, field in zip(zip(*rows), schema)
+            ],
+            schema=schema,
+        )
+        writer.write_batch(batch)
+        yield drain(sink)
+    writer.close()
+    yield drain(sink)
+
+
+def create_export(db: SQLAlchemy) -> Blueprint:
+    export = Blueprint("export", __name__, url_prefix="/export")
+
+    @export.get("/<table_name>/<purpose_name>.<file_format>")
+    def export_series(table_name: str, purpose_name: str, file_format: str):
+        table_type = TABLES.get(table_name)
+        if table_type is None or file_format not in FORMATS:
+            abort(404)
+        purpose = table_type.purpose.__members__.get(purpose_name)
+        series = DatasetCatalog.get(db.session).get(table_name, {}).get(purpose_name)
+        if purpose is None or not series:
+            abort(404)
+
+        years = sorted(series)
+        start = (years[0], series[years[0]][0])
+        end = (years[-1], series[years[-1]][1])
+        try:
+            if "start" in request.args:
+                start = parse_period(request.args["start"])
+            if "end" in request.args:
+                end = parse_period(request.args["end"])
+        except ValueError:
+            abort(400, "start and end must be YYYY-MM periods")
+
+        generation = EtlMetadata.get_generation(db.session)
+        key = f"{generation}:{table_name}:{purpose_name}:{start}:{end}:{file_format}"
+        etag = hashlib.sha256(key.encode()).hexdigest()[:32]
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+            response.set_etag(etag)
+            return response
+
+        query = table_type.table.range_query(purpose, start, end, 1)
+        columns = list(query.selected_columns)
+        schema = pyarrow.schema(
+            [pyarrow.field(column.name, arrow_type(column)) for column in columns]
+        )
+
+        engine = db.engine
+
+        def generate() -> Iterator[bytes]:
+            # A server-side cursor on its own connection, so full history is
+            # never held in memory and the request's session is not tied up.
+            with engine.connect() as connection:
+                options = {"stream_results": True, "max_row_buffer": EXPORT_CHUNK_ROWS}
+                if connection.dialect.name == "postgresql":
+                    # Server-side cursors need a transaction, even in autocommit
+                    # mode, and one snapshot keeps the export consistent.
+                    options["isolation_level"] = "REPEATABLE READ"
+                result = connection.execution_options(**options).execute(query)
+                partitions = result.partitions(EXPORT_CHUNK_ROWS)
+                if file_format == "csv":
+                    yield from write_csv(list(result.keys()), partitions)
+                else:
+                    yield from write_arrow(schema, partitions, file_format)
+
+        filename = (
+            f"{table_name}-{purpose_name}"
+            f"-{start[0]}-{start[1]:02}-{end[0]}-{end[1]:02}"
+        )
+        response = Response(generate(), mimetype=FORMATS[file_format])
+        response.set_etag(etag)
+        response.headers["Content-Disposition"] = (
+            f'attachment; filename="{filename}.{file_format}"'
+        )
+        return response
+
+    return export
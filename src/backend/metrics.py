@@ -0,0 +1,107 @@
+from time import perf_counter
+
+from flask import Blueprint, Response, g, has_request_context, request
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from src.backend.database import pool_metrics
+from src.common.metrics import Metrics, metrics
+from src.db import catalog_cache
+from src.db.cache import ResultCache, result_cache
+from src.frontend.app import series_cache
+
+CACHES = {"result": result_cache, "catalog": catalog_cache, "series": series_cache}
+DASH_CALLBACK_PATH = "/_dash-update-component"
+
+
+def collect_caches(caches: dict[str, ResultCache]):
+    def collect(metrics: Metrics):
+        for name, cache in caches.items():
+            metrics.set_counter("dashboard_cache_hits_total", cache.hits, cache=name)
+            metrics.set_counter(
+                "dashboard_cache_misses_total", cache.misses, cache=name
+            )
+
+    return collect
+
+
+def collect_pool(db: SQLAlchemy, app):
+    def collect(metrics: Metrics):
+        with app.app_context():
+            pool = pool_metrics(db)
+        for name, key in (
+            ("dashboard_pool_checkouts_total", "checkouts"),
+            ("dashboard_pool_timeouts_total", "timeouts"),
+            ("dashboard_pool_wait_seconds_total", "wait_seconds_total"),
+        ):
+            if key in pool:
+                metrics.set_counter(name, pool[key])
+
+    return collect
+
+
+def track_statements():
+    @event.listens_for(Engine, "before_cursor_execute")
+    def start_statement(connection, *args):
+        # Overwritten by the next statement, so failed ones leave nothing behind.
+        connection.info["metrics_started"] = perf_counter()
+
+    @event.listens_for(Engine, "after_cursor_execute")
+    def end_statement(connection, *args):
+        started = connection.info.pop("metrics_started", None)
+        if started is None:
+            return
+        seconds = perf_counter() - started
+        metrics.add("dashboard_db_statements_total")
+        if has_request_context() and "metrics_start" in g:
+            g.metrics_db_seconds += seconds
+
+
+def create_metrics(db: SQLAlchemy) -> Blueprint:
+    blueprint = Blueprint("metrics", __name__)
+    track_statements()
+    metrics.collectors.append(collect_caches(CACHES))
+
+    @blueprint.record_once
+    def register(state):
+        metrics.collectors.append(collect_pool(db, state.app))
+
+    @blueprint.before_app_request
+    def start_request():
+        if request.path.endswith(DASH_CALLBACK_PATH):
+            payload = request.get_json(silent=True) or {}
+            g.metrics_callback = str(payload.get("output", ""))
+            g.metrics_db_seconds = 0.0
+            g.metrics_start = perf_counter()
+
+    @blueprint.after_app_request
+    def end_request(response: Response) -> Response:
+        if "metrics_start" not in g:
+            return response
+
+        seconds = perf_counter() - g.metrics_start
+        callback = g.metrics_callback
+        metrics.observe("dashboard_callback_seconds", seconds, callback=callback)
+        metrics.observe("dashboard_db_seconds", g.metrics_db_seconds, callback=callback)
+        if response.content_length is not None:
+            metrics.observe(
+                "dashboard_response_bytes", response.content_length, callback=callback
+            )
+        handled = g.get("metrics_stages", {}).get("callback")
+        if handled is not None:
+            # What Dash spends on serializing the returned components.
+            metrics.observe(
+                "dashboard_stage_seconds",
+                seconds - handled,
+                callback=callback,
+                stage="serialize",
+            )
+        metrics.flush()
+        return response
+
+    @blueprint.get("/metrics")
+    def get_metrics():
+        return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+    return blueprint
@@ -0,0 +1,216 @@
+import json
+import os
+import shutil
+import threading
+from collections.abc import Callable
+from contextlib import contextmanager
+from os import getenv
+from pathlib import Path
+from time import monotonic, perf_counter
+
+from flask import g, has_request_context
+
+METRICS_DIR = getenv("METRICS_DIR", ".temp/metrics/")
+METRICS_FLUSH_INTERVAL = float(getenv("METRICS_FLUSH_INTERVAL", "1"))
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BYTES_BUCKETS = (1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+HISTOGRAMS = {
+    "dashboard_callback_seconds": (
+        "Dash callback requests, including serialization",
+        SECONDS_BUCKETS,
+    ),
+    "dashboard_stage_seconds": ("Stages of Dash callbacks", SECONDS_BUCKETS),
+    "dashboard_db_seconds": ("Database time per Dash callback", SECONDS_BUCKETS),
+    "dashboard_response_bytes": ("Dash callback response sizes", BYTES_BUCKETS),
+}
+COUNTERS = {
+    "dashboard_cache_hits_total": "Result cache hits",
+    "dashboard_cache_misses_total": "Result cache misses",
+    "dashboard_db_statements_total": "Executed SQL statements",
+    "dashboard_pool_checkouts_total": "Connection pool checkouts",
+    "dashboard_pool_timeouts_total": "Connection pool checkout timeouts",
+    "dashboard_pool_wait_seconds_total": "Time spent waiting for a pool connection",
+}
+
+
+def merge(totals: dict, data: dict):
+    for name, series in data["histograms"].items():
+        for key, values in series.items():
+            total = totals["histograms"].setdefault(name, {}).get(key)
+            if total is None:
+                totals["histograms"][name][key] = dict(values)
+                continue
+            total["buckets"] = [
+                a + b for a, b in zip(total["buckets"], values["buckets"])
+            ]
+            total["sum"] += values["sum"]
+            total["count"] += values["count"]
+    for name, series in data["counters"].items():
+        for key, value in series.items():
+            counters = totals["counters"].setdefault(name, {})
+            counters[key] = counters.get(key, 0) + value
+
+
+def write_atomic(path: Path, text: str):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = path.with_suffix(".tmp")
+    temporary.write_text(text)
+    os.replace(temporary, path)
+
+
+def label_key(labels: dict[str, str]) -> str:
+    return json.dumps(sorted(labels.items()))
+
+
+def format_labels(key: str, **extra: str) -> str:
+    labels = [*json.loads(key), *extra.items()]
+    if not labels:
+        return ""
+    # JSON string escaping matches the Prometheus text format for label values.
+    pairs = (
+        f"{name}={json.dumps(str(value), ensure_ascii=False)}" for name, value in labels
+    )
+    return "{" + ",".join(pairs) + "}"
+
+
+class Metrics:
+    def __init__(
+            self,
+            directory: str = METRICS_DIR,
+            flush_interval: float = METRICS_FLUSH_INTERVAL,
+    ):
+        self.directory = Path(directory)
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+        self.histograms: dict[str, dict[str, dict]] = {}
+        self.counters: dict[str, dict[str, float]] = {}
+        self.collectors: list[Callable[[Metrics], None]] = []
+        self.flushed = None
+
+    def observe(self, name: str, value: float, **labels: str):
+        buckets = HISTOGRAMS[name][1]
+        with self.lock:
+            series = self.histograms.setdefault(name, {}).setdefault(
+                label_key(labels),
+                {"buckets": [0] * len(buckets), "sum": 0.0, "count": 0},
+            )
+            for index, bound in enumerate(buckets):
+                if value <= bound:
+                    series["buckets"][index] += 1
+                    break
+            series["sum"] += value
+            series["count"] += 1
+
+    def set_counter(self, name: str, value: float, **labels: str):
+        # For totals kept elsewhere, like cache and pool statistics.
+        with self.lock:
+            self.counters.setdefault(name, {})[label_key(labels)] = value
+
+    def add(self, name: str, value: float = 1, **labels: str):
+        with self.lock:
+            series = self.counters.setdefault(name, {})
+            key = label_key(labels)
+            series[key] = series.get(key, 0) + value
+
+    @contextmanager
+    def stage(self, name: str):
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            seconds = perf_counter() - start
+            callback = ""
+            if has_request_context():
+                g.setdefault("metrics_stages", {})[name] = seconds
+                callback = g.get("metrics_callback", "")
+            self.observe(
+                "dashboard_stage_seconds", seconds, callback=callback, stage=name
+            )
+
+    def flush(self, force: bool = False):
+        # Every worker writes its own file, so the route that renders them
+        # sees all gunicorn workers, whichever worker serves the request.
+        now = monotonic()
+        if not force and self.flushed and now - self.flushed < self.flush_interval:
+            return
+        self.flushed = now
+        for collector in self.collectors:
+            collector(self)
+
+        with self.lock:
+            data = json.dumps(
+                {"histograms": self.histograms, "counters": self.counters}
+            )
+        write_atomic(self.directory / f"{os.getpid()}.json", data)
+
+    def retire(self, pid: int):
+        # Called by the gunicorn master for every exited worker. Its counts
+        # move into retired.json, so totals never go down and a recycled PID
+        # starts from an empty file.
+        path = self.directory / f"{pid}.json"
+        try:
+            data = json.loads(path.read_text())
+        except (OSError, ValueError):
+            return
+        retired = self.directory / "retired.json"
+        totals = {"histograms": {}, "counters": {}}
+        if retired.exists():
+            merge(totals, json.loads(retired.read_text()))
+        merge(totals, data)
+        write_atomic(retired, json.dumps(totals))
+        path.unlink()
+
+    def reset(self):
+        # Totals are per server run, so whoever starts the server clears them.
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def collect(self) -> dict:
+        totals = {"histograms": {}, "counters": {}}
+        for path in sorted(self.directory.glob("*.json")):
+            try:
+                merge(totals, json.loads(path.read_text()))
+            except (OSError, ValueError):
+                continue
+        return totals
+
+    def render(self) -> str:
+        self.flush(force=True)
+        data = self.collect()
+        lines = []
+        for name, (description, buckets) in HISTOGRAMS.items():
+            lines += [f"# HELP {name} {description}", f"# TYPE {name} histogram"]
+            for key, values in data["histograms"].get(name, {}).items():
+                cumulative = 0
+                for bound, count in zip(buckets, values["buckets"]):
+                    cumulative += count
+                    lines.append(
+                        f"{name}_bucket{format_labels(key, le=str(bound))} {cumulative}"
+                    )
+                lines += [
+                    f"{name}_bucket{format_labels(key, le='+Inf')} {values['count']}",
+                    f"{name}_sum{format_labels(key)} {values['sum']}",
+                    f"{name}_count{format_labels(key)} {values['count']}",
+                ]
+        for name, description in COUNTERS.items():
+            lines += [f"# HELP {name} {description}", f"# TYPE {name} counter"]
+            for key, value in data["counters"].get(name, {}).items():
+                lines.append(f"{name}{format_labels(key)} {value}")
+
+        hits = data["counters"].get("dashboard_cache_hits_total", {})
+        misses = data["counters"].get("dashboard_cache_misses_total", {})
+        lines += [
+            "# HELP dashboard_cache_hit_ratio Share of result cache lookups that hit",
+            "# TYPE dashboard_cache_hit_ratio gauge",
+        ]
+        for key, count in hits.items():
+            lookups = count + misses.get(key, 0)
+            if lookups:
+                lines.append(
+                    f"dashboard_cache_hit_ratio{format_labels(key)} {count / lookups}"
+                )
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
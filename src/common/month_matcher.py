@@ -1,3 +1,6 @@
+from pandas import Series
+
+
 def month_to_integer(month: str) -> int | None:
     month = month.lower().strip().rstrip()
     for i, matches in enumerate(MONTH_MATCHES):
@@ -6,6 +9,10 @@ def month_to_integer(month: str) -> int | None:
     return None
 
 
+def months_to_integers(months: Series) -> Series:
+    return months.astype(str).str.lower().str.strip().map(MONTH_INDEX)
+
+
 MONTH_MATCHES = [
     ["jan", "january", "januar"],
     ["feb", "february", "februar"],
@@ -20,3 +27,7 @@ MONTH_MATCHES = [
     ["nov", "november", "novembar"],
     ["dec", "december", "decembar"],
 ]
+
+MONTH_INDEX = {
+    match: i + 1 for i, matches in enumerate(MONTH_MATCHES) for match in matches
+}
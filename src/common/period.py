@@ -0,0 +1,5 @@
+def parse_period(value: str) -> tuple[int, int]:
+    year, month = (int(part) for part in value.split("-"))
+    if not 1 <= month <= 12:
+        raise ValueError(f"invalid month in {value!r}")
+    return year, month
@@ -1,94 +1,264 @@
+from datetime import datetime
 from enum import Enum
-from typing import Tuple
+from math import ceil
 
-import pandas
 import sqlalchemy
-from numpy import isnan
 from pandas import isnull, DataFrame
 from plotly import express
 from plotly.graph_objs import Figure
-from sqlalchemy import Row
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import Select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
 from sqlalchemy.orm import (
-    Session,
     DeclarativeBase,
+    Mapped,
+    mapped_column,
     scoped_session,
 )
 
-from src.common.month_matcher import month_to_integer
+from src.db.cache import ResultCache, result_cache
+
+KEY_COLUMNS = ["year", "month", "purpose"]
+
+catalog_cache = ResultCache(max_size=1, ttl=0)
 
 
 def or_none(element):
     return None if isnull(element) else element
 
+def to_records(frame: DataFrame, columns: list[str]) -> list[dict]:
+    values = frame.astype(object).where(frame.notna(), None)
+    return [
+        dict(zip(columns, row))
+        for row in values.itertuples(index=False, name=None)
+    ]
+
+def data_columns(table: sqlalchemy.Table) -> list[sqlalchemy.Column]:
+    return [
+        column
+        for column in table.c
+        if column.name not in ("id", "hash")
+        and not column.name.endswith("_id")
+        and not isinstance(column.type, sqlalchemy.Enum)
+    ]
+
+def to_frame(result: sqlalchemy.Result) -> DataFrame:
+    return DataFrame.from_records(result.fetchall(), columns=list(result.keys()))
+
+def bucket_size(
+        start: tuple[int, int],
+        end: tuple[int, int],
+        resolution: int = 1,
+        max_points: int | None = None,
+) -> int:
+    months = (end[0] - start[0]) * 12 + end[1] - start[1] + 1
+    step = resolution
+    if max_points:
+        step = max(step, ceil(months / max_points))
+    # Only divisors and multiples of a year, so buckets follow the calendar.
+    if step > 12:
+        return ceil(step / 12) * 12
+    return next(
+        size for size in (1, 2, 3, 4, 6, 12) if size >= step and size % resolution == 0
+    )
+
 class SerializableType(Enum):
     pass
 
 class Base(DeclarativeBase):
     pass
 
+class EtlMetadata(Base):
+    __tablename__ = "etl_metadata"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    generation: Mapped[int] = mapped_column(sqlalchemy.Integer)
+    updated_at: Mapped[datetime] = mapped_column(sqlalchemy.DateTime(timezone=True))
+
+    @classmethod
+    def get_generation(cls, session: scoped_session) -> int:
+        query = sqlalchemy.select(cls.generation).where(cls.id == 1)
+        return session.execute(query).scalar() or 0
+
+    @classmethod
+    async def get_generation_async(cls, session: AsyncSession) -> int:
+        query = sqlalchemy.select(cls.generation).where(cls.id == 1)
+        return (await session.execute(query)).scalar() or 0
+
+    @classmethod
+    async def bump_generation(cls, session: AsyncSession):
+        query = insert(cls).values(id=1, generation=1, updated_at=sqlalchemy.func.now())
+        query = query.on_conflict_do_update(
+            index_elements=["id"],
+            set_={
+                "generation": cls.generation + 1,
+                "updated_at": query.excluded.updated_at,
+            },
+        )
+        await session.execute(query)
+
+class DatasetCatalog(Base):
+    __tablename__ = "dataset_catalog"
+
+    table_name: Mapped[str] = mapped_column(sqlalchemy.String, primary_key=True)
+    purpose: Mapped[str] = mapped_column(sqlalchemy.String, primary_key=True)
+    year: Mapped[int] = mapped_column(sqlalchemy.Integer, primary_key=True)
+    min_month: Mapped[int] = mapped_column(sqlalchemy.Integer)
+    max_month: Mapped[int] = mapped_column(sqlalchemy.Integer)
+
+    @classmethod
+    async def has_table(cls, session: AsyncSession, table: type[Base]) -> bool:
+        query = sqlalchemy.select(
+            sqlalchemy.exists().where(cls.table_name == table.__tablename__)
+        )
+        return (await session.execute(query)).scalar()
+
+    @classmethod
+    async def refresh(cls, session: AsyncSession, table: type[Base]):
+        source = table.__table__.c
+        await session.execute(
+            sqlalchemy.delete(cls).where(cls.table_name == table.__tablename__)
+        )
+        query = (
+            sqlalchemy.select(
+                sqlalchemy.literal(table.__tablename__),
+                sqlalchemy.cast(source.purpose, sqlalchemy.String),
+                source.year,
+                sqlalchemy.func.min(source.month),
+                sqlalchemy.func.max(source.month),
+            )
+            .where(source.year.is_not(None))
+            .group_by(source.purpose, source.year)
+        )
+        await session.execute(
+            insert(cls).from_select(
+                ["table_name", "purpose", "year", "min_month", "max_month"], query
+            )
+        )
+
+    @classmethod
+    def from_rows(cls, rows) -> dict[str, dict[str, dict[int, tuple]]]:
+        catalog = {}
+        for row in rows:
+            series = catalog.setdefault(row.table_name, {}).setdefault(row.purpose, {})
+            series[row.year] = (row.min_month, row.max_month)
+        return catalog
+
+    @classmethod
+    def get(cls, session: scoped_session) -> dict[str, dict[str, dict[int, tuple]]]:
+        return catalog_cache.get(
+            "catalog",
+            lambda: cls.from_rows(session.execute(sqlalchemy.select(cls.__table__))),
+            lambda: EtlMetadata.get_generation(session),
+        )
+
+    @classmethod
+    async def get_async(
+            cls, session: AsyncSession
+    ) -> dict[str, dict[str, dict[int, tuple]]]:
+        async def load():
+            rows = await session.execute(sqlalchemy.select(cls.__table__))
+            return cls.from_rows(rows)
+
+        return await catalog_cache.get_async(
+            "catalog", load, lambda: EtlMetadata.get_generation_async(session)
+        )
+
 class SerializableTable:
     __tablename__ = ""
+    layout = None
+    unit = "U % na godišnjem nivou"
 
     @classmethod
-    def get_years(cls, session):
-        table = cls.__table__.c
-        query = sqlalchemy.select(table.year).distinct().order_by(table.year)
-        result = session.execute(query)
-        years = [row[0] for row in result.fetchall() if row[0] is not None]
-        return years
+    def get_purposes(cls, session: scoped_session) -> list[str]:
+        return list(DatasetCatalog.get(session).get(cls.__tablename__, {}))
 
     @classmethod
-    def _get_start_end_points(cls, frame: DataFrame) -> Tuple[int, int]:
-        start = 0
-        while month_to_integer(str(frame.iloc[start, 1])) is None:
-            start += 1
-        end = 0
-        while month_to_integer(str(frame.iloc[end, 1])) is None:
-            end -= 1
-        end += 1
-        return start, end
+    def get_years(
+            cls, session: scoped_session, purpose: SerializableType | None = None
+    ) -> list[int]:
+        series = DatasetCatalog.get(session).get(cls.__tablename__, {})
+        if purpose is not None:
+            series = {purpose.name: series.get(purpose.name, {})}
+        return sorted({year for years in series.values() for year in years})
 
     @classmethod
-    async def _process_rows(
+    async def _process_block(
             cls,
-            session: Session,
-            date_frame: DataFrame,
-            table_frame: DataFrame,
+            session: AsyncSession,
             purpose: type[SerializableType],
+            block: DataFrame,
             **extra_data,
-    ):
-        previous_year = None
-        index: int = 0
-        try:
-            for i, row in table_frame.iterrows():
-                date = date_frame.iloc[index]
-                index += 1
-                year = date.iloc[0]
-                if isnan(year):
-                    year = previous_year
-                else:
-                    year = int(year)
-                    previous_year = year
-                month = month_to_integer(date.iloc[1])
-
-                await cls.insert(session, purpose, year, month, row, **extra_data)
-
-        except Exception as exception:
-            print(f"Error processing row {i}: {exception}")
-
-    @classmethod
-    async def process_frame(cls, session: AsyncSession, frame: DataFrame):
-        pass
+    ) -> int:
+        if session.info.get("incremental"):
+            block = await cls._filter_incremental(
+                session, purpose, block, session.info.get("revision_window", 0)
+            )
+        if block.empty:
+            return 0
+        await cls.insert_block(session, purpose, block, **extra_data)
+        return len(block)
+
+    @classmethod
+    async def load_blocks(cls, session: AsyncSession, blocks) -> int:
+        rows = 0
+        for purpose_block, block in blocks:
+            rows += await cls._process_block(
+                session, purpose_block.purpose, block, **purpose_block.extra_data
+            )
+        return rows
+
+    @classmethod
+    async def get_latest_period(
+            cls, session: AsyncSession, purpose: type[SerializableType]
+    ) -> int | None:
+        table = cls.__table__.c
+        query = (
+            sqlalchemy.select(sqlalchemy.func.max(table.year * 12 + table.month - 1))
+            .where(table.purpose == purpose.name)
+        )
+        return (await session.execute(query)).scalar()
 
     @classmethod
-    async def insert(
+    async def _filter_incremental(
             cls,
-            session: Session,
+            session: AsyncSession,
             purpose: type[SerializableType],
-            year: int,
-            month: int,
-            row: DataFrame,
+            block: DataFrame,
+            revision_window: int,
+    ) -> DataFrame:
+        latest = await cls.get_latest_period(session, purpose)
+        if latest is None:
+            return block
+        period = block["year"] * 12 + block["month"] - 1
+        return block[period > latest - revision_window].reset_index(drop=True)
+
+    @classmethod
+    async def upsert(cls, session: AsyncSession, records: DataFrame):
+        records = records.drop_duplicates(subset=KEY_COLUMNS, keep="last")
+        table = cls.__table__
+        values = [column for column in records.columns if column not in KEY_COLUMNS]
+
+        query = insert(cls)
+        query = query.on_conflict_do_update(
+            index_elements=KEY_COLUMNS,
+            set_={column: query.excluded[column] for column in values},
+            where=sqlalchemy.tuple_(*(table.c[c] for c in values)).is_distinct_from(
+                sqlalchemy.tuple_(*(query.excluded[c] for c in values))
+            ),
+        )
+        await session.execute(query, to_records(records, list(records.columns)))
+
+    @classmethod
+    async def process_frame(cls, session: AsyncSession, frame: DataFrame) -> int:
+        return await cls.load_blocks(session, cls.layout.extract(frame))
+
+    @classmethod
+    async def insert_block(
+            cls,
+            session: AsyncSession,
+            purpose: type[SerializableType],
+            block: DataFrame,
             **extra_data,
     ):
         pass
@@ -101,59 +271,156 @@ class SerializableTable:
             year: int,
             month_range: range,
     ) -> DataFrame:
+        return cls.get_range(
+            session, purpose, (year, month_range[0]), (year, month_range[-1])
+        )
+
+    @classmethod
+    def get_range(
+            cls,
+            session: scoped_session,
+            purpose: SerializableType,
+            start: tuple[int, int],
+            end: tuple[int, int],
+            resolution: int = 1,
+            max_points: int | None = None,
+    ) -> DataFrame:
+        step = bucket_size(start, end, resolution, max_points)
+        return result_cache.get(
+            (cls.__tablename__, purpose.name, start, end, step),
+            lambda: to_frame(
+                session.execute(cls.range_query(purpose, start, end, step))
+            ),
+            lambda: EtlMetadata.get_generation(session),
+        )
+
+    @classmethod
+    async def get_range_async(
+            cls,
+            session: AsyncSession,
+            purpose: SerializableType,
+            start: tuple[int, int],
+            end: tuple[int, int],
+            resolution: int = 1,
+            max_points: int | None = None,
+    ) -> DataFrame:
+        step = bucket_size(start, end, resolution, max_points)
+
+        async def load():
+            query = cls.range_query(purpose, start, end, step)
+            return to_frame(await session.execute(query))
+
+        return await result_cache.get_async(
+            (cls.__tablename__, purpose.name, start, end, step),
+            load,
+            lambda: EtlMetadata.get_generation_async(session),
+        )
+
+    @classmethod
+    def range_source(
+            cls,
+            purpose: SerializableType,
+            start: tuple[int, int],
+            end: tuple[int, int],
+    ) -> sqlalchemy.FromClause:
+        return cls.read_model()
+
+    @classmethod
+    def range_query(
+            cls,
+            purpose: SerializableType,
+            start: tuple[int, int],
+            end: tuple[int, int],
+            step: int,
+    ) -> Select:
+        view = cls.range_source(purpose, start, end)
+        values = [column for column in view.c if column.name not in KEY_COLUMNS]
+        if step == 1:
+            columns = [view.c.year, view.c.month, *values]
+            order = [view.c.year, view.c.month]
+        else:
+            # Buckets of `step` months, counted from January of year 0 so
+            # quarters and years line up with the calendar.
+            period = view.c.year * 12 + view.c.month - 1
+            first = sqlalchemy.func.min(period)
+            columns = [
+                (first // 12).label("year"),
+                (first % 12 + 1).label("month"),
+                *(sqlalchemy.func.avg(column).label(column.name) for column in values),
+            ]
+            order = [first]
+
+        key = sqlalchemy.tuple_(view.c.year, view.c.month)
+        query = (
+            sqlalchemy.select(*columns)
+            .where(view.c.purpose == purpose.name)
+            .where(key >= sqlalchemy.tuple_(*start))
+            .where(key <= sqlalchemy.tuple_(*end))
+            .order_by(*order)
+        )
+        if step != 1:
+            query = query.group_by(period // step)
+        return query
+
+    @classmethod
+    def query(cls) -> Select:
         table = cls.__table__
+        columns = [column.label(column.name) for column in data_columns(table)]
+        joined = table
+        for relationship in sqlalchemy.inspect(cls).relationships:
+            relation = relationship.mapper.local_table
+            columns += [
+                column.label(f"{relationship.key}.{column.name}")
+                for column in data_columns(relation)
+            ]
+            joined = joined.outerjoin(relation, relationship.primaryjoin)
+        return sqlalchemy.select(*columns).select_from(joined)
 
-        rows = (
-            cls.query(session)
-            .where(table.c.purpose == purpose.name)
-            .where(table.c.year == year)
-            .where(table.c.month.between(month_range[0], month_range[-1]))
-            .all()
+    @classmethod
+    def read_model_query(cls) -> Select:
+        purpose = sqlalchemy.cast(cls.__table__.c.purpose, sqlalchemy.String)
+        return cls.query().add_columns(purpose.label("purpose"))
+
+    @classmethod
+    def read_model(cls) -> sqlalchemy.TableClause:
+        return sqlalchemy.table(
+            f"{cls.__tablename__}_read_model",
+            *(
+                sqlalchemy.column(column.key, column.type)
+                for column in cls.read_model_query().selected_columns
+            ),
         )
 
-        frames = []
-        for row in rows:
-            if isinstance(row, Row):
-                row = row[0]
-            df = row.to_frame()
-            frames.append(df)
-
-        if not frames:
-            return DataFrame()
-
-        return pandas.concat(frames, ignore_index=True)
-
-    @classmethod
-    def query(cls, session: scoped_session):
-        return session.query(cls)
-
-    def to_frame(self) -> DataFrame:
-        return pandas.DataFrame(self.to_dict())
-
-    def to_dict(self) -> dict:
-        data = {}
-
-        for key, value in self.__dict__.items():
-            if key.startswith("_"):
-                continue
-            if key.endswith("_id") or key == "id":
-                continue
-            if isinstance(value, SerializableType):
-                continue
-            if not isinstance(value, (bool, str, int, float, type(None))):
-                continue
-            data[key] = [value]
-
-        for key, value in self.__dict__.items():
-            if key.startswith("_"):
-                continue
-            if not key.endswith("_id") and f"{key}_id" in self.__dict__:
-                if value is not None and isinstance(value, SerializableTable):
-                    relation = value.to_frame()
-                    relation_dict = { f"{key}.{k}": v for k, v in relation.to_dict("list").items() }
-                    data.update(relation_dict)
-
-        return data
+    @classmethod
+    async def create_read_model(cls, connection: AsyncConnection):
+        view = cls.read_model()
+        quote = connection.dialect.identifier_preparer.quote
+        query = cls.read_model_query().compile(
+            dialect=connection.dialect, compile_kwargs={"literal_binds": True}
+        )
+        included = ", ".join(
+            quote(column.name)
+            for column in view.c
+            if column.name not in KEY_COLUMNS
+        )
+        await connection.exec_driver_sql(
+            f"CREATE MATERIALIZED VIEW IF NOT EXISTS {quote(view.name)} AS {query}"
+        )
+        # Unique so the view can be refreshed concurrently, covering so chart
+        # queries are answered from the index alone.
+        await connection.exec_driver_sql(
+            f"CREATE UNIQUE INDEX IF NOT EXISTS {quote(view.name + '_key')} "
+            f"ON {quote(view.name)} (purpose, year, month) INCLUDE ({included})"
+        )
+
+    @classmethod
+    async def refresh_read_model(cls, session: AsyncSession):
+        quote = session.bind.dialect.identifier_preparer.quote
+        await session.execute(
+            sqlalchemy.text(
+                f"REFRESH MATERIALIZED VIEW CONCURRENTLY {quote(cls.read_model().name)}"
+            )
+        )
 
     def to_express(self, data: DataFrame, theme: str) -> Figure:
         return express.bar(
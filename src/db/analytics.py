@@ -0,0 +1,202 @@
+from abc import ABC, abstractmethod
+
+import sqlalchemy
+from pandas import DataFrame
+from plotly.graph_objs import Figure
+from sqlalchemy.orm import scoped_session
+
+from src.db import KEY_COLUMNS, SerializableTable, SerializableType
+from src.db.household import HouseholdLoans, HouseholdTermDeposits
+from src.db.non_financial import NonFinancialLoans, NonFinancialTermDeposits
+
+
+def to_period(year, month):
+    return year * 12 + month - 1
+
+
+class DerivedSeries(SerializableTable):
+    source: type[SerializableTable] = SerializableTable
+
+    @classmethod
+    def get_purposes(cls, session: scoped_session) -> list[str]:
+        return cls.source.get_purposes(session)
+
+    @classmethod
+    def get_years(
+            cls, session: scoped_session, purpose: SerializableType | None = None
+    ) -> list[int]:
+        return cls.source.get_years(session, purpose)
+
+    def to_express(self, data: DataFrame, theme: str) -> Figure:
+        return self.source.to_express(self.source, data, theme)
+
+    def get_columns(self):
+        return self.source.get_columns(self.source)
+
+
+class WindowSeries(DerivedSeries, ABC):
+    # Months of history the window needs before the first requested month.
+    lookback = 0
+
+    @classmethod
+    @abstractmethod
+    def window(
+            cls, column: sqlalchemy.ColumnElement, period: sqlalchemy.ColumnElement
+    ) -> sqlalchemy.ColumnElement: ...
+
+    @classmethod
+    def range_source(
+            cls,
+            purpose: SerializableType,
+            start: tuple[int, int],
+            end: tuple[int, int],
+    ) -> sqlalchemy.FromClause:
+        view = cls.source.read_model()
+        period = to_period(view.c.year, view.c.month)
+        values = [column for column in view.c if column.name not in KEY_COLUMNS]
+        # Windows frame on the period value, not on row positions, so
+        # missing months never shift a comparison onto the wrong month.
+        return (
+            sqlalchemy.select(
+                view.c.purpose,
+                view.c.year,
+                view.c.month,
+                *(cls.window(column, period).label(column.name) for column in values),
+            )
+            .where(view.c.purpose == purpose.name)
+            .where(period >= to_period(*start) - cls.lookback)
+            .where(period <= to_period(*end))
+            .subquery()
+        )
+
+
+class YearOverYear(WindowSeries):
+    lookback = 12
+    unit = "U procentnim poenima, u odnosu na isti mesec prethodne godine"
+
+    @classmethod
+    def window(
+            cls, column: sqlalchemy.ColumnElement, period: sqlalchemy.ColumnElement
+    ) -> sqlalchemy.ColumnElement:
+        previous = sqlalchemy.func.first_value(column).over(
+            order_by=period, range_=(-12, -12)
+        )
+        return column - previous
+
+
+class RollingAverage(WindowSeries):
+    lookback = 11
+    unit = "U % na godišnjem nivou, prosek poslednjih 12 meseci"
+
+    @classmethod
+    def window(
+            cls, column: sqlalchemy.ColumnElement, period: sqlalchemy.ColumnElement
+    ) -> sqlalchemy.ColumnElement:
+        return sqlalchemy.func.avg(column).over(order_by=period, range_=(-11, 0))
+
+
+class Spread(DerivedSeries):
+    # Loan rates of each purpose minus the rates on all term deposits.
+    deposits: type[SerializableTable] = SerializableTable
+    deposit_purpose = "TOTAL"
+    unit = "U procentnim poenima, krediti umanjeni za depozite"
+
+    @classmethod
+    def get_years(
+            cls, session: scoped_session, purpose: SerializableType | None = None
+    ) -> list[int]:
+        purposes = cls.deposits.__table__.c.purpose.type.enum_class
+        deposit_years = set(
+            cls.deposits.get_years(session, purposes[cls.deposit_purpose])
+        )
+        return [
+            year
+            for year in cls.source.get_years(session, purpose)
+            if year in deposit_years
+        ]
+
+    @classmethod
+    def range_source(
+            cls,
+            purpose: SerializableType,
+            start: tuple[int, int],
+            end: tuple[int, int],
+    ) -> sqlalchemy.FromClause:
+        loans = cls.source.read_model()
+        deposits = cls.deposits.read_model()
+        values = [
+            column.name
+            for column in loans.c
+            if column.name not in KEY_COLUMNS and column.name in deposits.c
+        ]
+        return (
+            sqlalchemy.select(
+                loans.c.purpose,
+                loans.c.year,
+                loans.c.month,
+                *((loans.c[name] - deposits.c[name]).label(name) for name in values),
+            )
+            .join_from(
+                loans,
+                deposits,
+                sqlalchemy.and_(
+                    deposits.c.purpose == cls.deposit_purpose,
+                    deposits.c.year == loans.c.year,
+                    deposits.c.month == loans.c.month,
+                ),
+            )
+            .where(loans.c.purpose == purpose.name)
+            .subquery()
+        )
+
+
+class HouseholdSpread(Spread):
+    __tablename__ = "household_spread"
+    source = HouseholdLoans
+    deposits = HouseholdTermDeposits
+
+
+class NonFinancialSpread(Spread):
+    __tablename__ = "non_financial_spread"
+    source = NonFinancialLoans
+    deposits = NonFinancialTermDeposits
+
+
+class HouseholdLoansYearOverYear(YearOverYear):
+    __tablename__ = "household_loans_yoy"
+    source = HouseholdLoans
+
+
+class HouseholdTermDepositsYearOverYear(YearOverYear):
+    __tablename__ = "household_term_deposits_yoy"
+    source = HouseholdTermDeposits
+
+
+class NonFinancialLoansYearOverYear(YearOverYear):
+    __tablename__ = "non_financial_loans_yoy"
+    source = NonFinancialLoans
+
+
+class NonFinancialTermDepositsYearOverYear(YearOverYear):
+    __tablename__ = "non_financial_term_deposits_yoy"
+    source = NonFinancialTermDeposits
+
+
+class HouseholdLoansRollingAverage(RollingAverage):
+    __tablename__ = "household_loans_rolling"
+    source = HouseholdLoans
+
+
+class HouseholdTermDepositsRollingAverage(RollingAverage):
+    __tablename__ = "household_term_deposits_rolling"
+    source = HouseholdTermDeposits
+
+
+class NonFinancialLoansRollingAverage(RollingAverage):
+    __tablename__ = "non_financial_loans_rolling"
+    source = NonFinancialLoans
+
+
+class NonFinancialTermDepositsRollingAverage(RollingAverage):
+    __tablename__ = "non_financial_term_deposits_rolling"
+    source = NonFinancialTermDeposits
@@ -0,0 +1,206 @@
+import asyncio
+import copy
+import fcntl
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Hashable
+from os import getenv
+from pathlib import Path
+from time import monotonic
+
+from pandas import DataFrame
+from pyarrow import feather
+
+RESULT_CACHE_SIZE = int(getenv("RESULT_CACHE_SIZE", "256"))
+RESULT_CACHE_TTL = float(getenv("RESULT_CACHE_TTL", "0"))
+RESULT_CACHE_CHECK_INTERVAL = float(getenv("RESULT_CACHE_CHECK_INTERVAL", "5"))
+RESULT_CACHE_SHARED_DIR = getenv("RESULT_CACHE_SHARED_DIR")
+
+
+class Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error: BaseException | None = None
+
+    def wait(self):
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+class ResultCache:
+    def __init__(
+            self,
+            max_size: int = RESULT_CACHE_SIZE,
+            ttl: float = RESULT_CACHE_TTL,
+            check_interval: float = RESULT_CACHE_CHECK_INTERVAL,
+            shared_dir: str | None = None,
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.check_interval = check_interval
+        self.entries: OrderedDict[Hashable, tuple[float, object]] = OrderedDict()
+        self.lock = threading.Lock()
+        self.generation = None
+        self.checked = None
+        self.hits = 0
+        self.misses = 0
+        # Loads in progress, so concurrent identical lookups share one query.
+        self.flights: dict[Hashable, Flight] = {}
+        self.async_flights: dict[Hashable, asyncio.Future] = {}
+        self.shared_dir = Path(shared_dir) if shared_dir else None
+
+    def _should_check(self) -> bool:
+        now = monotonic()
+        with self.lock:
+            if self.checked is not None and now - self.checked < self.check_interval:
+                return False
+            self.checked = now
+            return True
+
+    def _set_generation(self, generation: int):
+        with self.lock:
+            if generation == self.generation:
+                return
+            self.entries.clear()
+            self.generation = generation
+        if self.shared_dir is not None:
+            # Lock files are kept, since other workers may hold or wait on them.
+            for path in self.shared_dir.glob("*"):
+                if path.suffix != ".lock" and not path.name.startswith(
+                    f"{generation}-"
+                ):
+                    path.unlink(missing_ok=True)
+
+    def _load_shared(self, key: Hashable, load: Callable[[], object], generation):
+        # Other worker processes wait on the file lock and read the result
+        # the first one wrote, instead of running the same query. Results are
+        # stored as Feather, never unpickled, so the directory holds data only.
+        if self.shared_dir is None or generation is None:
+            return load()
+        self.shared_dir.mkdir(parents=True, exist_ok=True)
+        name = hashlib.sha256(repr(key).encode()).hexdigest()
+        path = self.shared_dir / f"{generation}-{name}.feather"
+        with open(self.shared_dir / f"{name}.lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                try:
+                    return feather.read_feather(path)
+                except FileNotFoundError:
+                    pass
+                value = load()
+                if isinstance(value, DataFrame):
+                    temporary = path.with_suffix(f".{os.getpid()}.tmp")
+                    feather.write_feather(value, temporary, compression="uncompressed")
+                    os.replace(temporary, path)
+                return value
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _lookup(self, key: Hashable) -> tuple[bool, object, int | None]:
+        now = monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and (not self.ttl or now - entry[0] < self.ttl):
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return True, copy.copy(entry[1]), self.generation
+            self.misses += 1
+            return False, None, self.generation
+
+    def _store(self, key: Hashable, value, generation: int | None):
+        with self.lock:
+            # Skip results loaded while the ETL moved to a newer generation.
+            if generation == self.generation:
+                self.entries[key] = (monotonic(), value)
+                self.entries.move_to_end(key)
+                while len(self.entries) > self.max_size:
+                    self.entries.popitem(last=False)
+
+    def get(
+            self,
+            key: Hashable,
+            load: Callable[[], object],
+            get_generation: Callable[[], int],
+    ):
+        if self.max_size <= 0:
+            return load()
+
+        if self._should_check():
+            self._set_generation(get_generation())
+        hit, value, generation = self._lookup(key)
+        if hit:
+            return value
+
+        with self.lock:
+            flight = self.flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.flights[key] = Flight()
+        if not leader:
+            return copy.copy(flight.wait())
+
+        try:
+            flight.value = self._load_shared(key, load, generation)
+            self._store(key, flight.value, generation)
+        except BaseException as error:
+            flight.error = error
+            raise
+        finally:
+            with self.lock:
+                del self.flights[key]
+            flight.done.set()
+        return copy.copy(flight.value)
+
+    async def get_async(
+            self,
+            key: Hashable,
+            load: Callable[[], Awaitable],
+            get_generation: Callable[[], Awaitable[int]],
+    ):
+        if self.max_size <= 0:
+            return await load()
+
+        if self._should_check():
+            self._set_generation(await get_generation())
+        hit, value, generation = self._lookup(key)
+        if hit:
+            return value
+
+        while (flight := self.async_flights.get(key)) is not None:
+            try:
+                return copy.copy(await asyncio.shield(flight))
+            except asyncio.CancelledError:
+                # Only the leader was cancelled, so the next waiter loads.
+                if not flight.cancelled():
+                    raise
+
+        flight = self.async_flights[key] = asyncio.get_running_loop().create_future()
+        try:
+            value = await load()
+            self._store(key, value, generation)
+            flight.set_result(value)
+        except asyncio.CancelledError:
+            flight.cancel()
+            raise
+        except BaseException as error:
+            flight.set_exception(error)
+            # Marks the exception as retrieved when nobody else was waiting.
+            flight.exception()
+            raise
+        finally:
+            del self.async_flights[key]
+        return copy.copy(value)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.generation = None
+            self.checked = None
+
+
+result_cache = ResultCache(shared_dir=RESULT_CACHE_SHARED_DIR)
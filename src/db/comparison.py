@@ -0,0 +1,63 @@
+import sqlalchemy
+from pandas import DataFrame
+from sqlalchemy import Select
+from sqlalchemy.orm import scoped_session
+
+from src.db import (
+    EtlMetadata,
+    SerializableTable,
+    SerializableType,
+    bucket_size,
+    to_frame,
+)
+from src.db.cache import result_cache
+
+Series = tuple[type[SerializableTable], SerializableType]
+
+
+def comparison_query(
+        series: list[Series],
+        columns: tuple[str, ...],
+        start: tuple[int, int],
+        end: tuple[int, int],
+        step: int,
+) -> Select:
+    selects = []
+    for index, (table, purpose) in enumerate(series):
+        source = table.range_query(purpose, start, end, step).subquery()
+        # The first of `columns` the table has, since tables name their
+        # totals differently.
+        name = next((name for name in columns if name in source.c), None)
+        value = source.c[name] if name else sqlalchemy.null()
+        selects.append(
+            sqlalchemy.select(
+                sqlalchemy.literal(index).label("series"),
+                source.c.year,
+                source.c.month,
+                sqlalchemy.cast(value, sqlalchemy.Float).label("value"),
+            )
+        )
+    union = sqlalchemy.union_all(*selects).subquery()
+    return sqlalchemy.select(union).order_by(
+        union.c.year, union.c.month, union.c.series
+    )
+
+
+def get_comparison(
+        session: scoped_session,
+        series: list[Series],
+        columns: tuple[str, ...],
+        start: tuple[int, int],
+        end: tuple[int, int],
+        resolution: int = 1,
+        max_points: int | None = None,
+) -> DataFrame:
+    step = bucket_size(start, end, resolution, max_points)
+    key = tuple((table.__tablename__, purpose.name) for table, purpose in series)
+    return result_cache.get(
+        ("comparison", key, columns, start, end, step),
+        lambda: to_frame(
+            session.execute(comparison_query(series, columns, start, end, step))
+        ),
+        lambda: EtlMetadata.get_generation(session),
+    )
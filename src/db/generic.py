@@ -1,19 +1,86 @@
-from pandas import DataFrame, Series
-from sqlalchemy import Float, ResultProxy
+import hashlib
+import json
+import math
+
+import sqlalchemy
+from pandas import DataFrame
+from sqlalchemy import Float, String
 from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import (
     Mapped,
     mapped_column,
-    Session,
 )
 
-from src.db import Base, SerializableTable, or_none
+from src.db import Base, SerializableTable, data_columns, to_records
+
+
+def content_hash(record: dict) -> str:
+    # Every value is hashed as a float in its shortest repr, and None and NaN
+    # both as null, so identity does not depend on how a value was typed on
+    # the way in. Adding 0.0 folds -0.0 into 0.0.
+    values = [
+        None if value is None or math.isnan(value) else float(value) + 0.0
+        for value in record.values()
+    ]
+    return hashlib.sha256(json.dumps(values).encode()).hexdigest()
+
+# Loads hold this advisory lock shared until they commit, and orphan
+# collection holds it exclusively, so rows a load has found or inserted but
+# not yet referenced are never collected under it.
+RATE_ROWS_LOCK = 7_310_410
+
+async def lock_rate_rows(session: AsyncSession, exclusive: bool = False):
+    if exclusive:
+        lock = sqlalchemy.func.pg_advisory_xact_lock(RATE_ROWS_LOCK)
+    else:
+        lock = sqlalchemy.func.pg_advisory_xact_lock_shared(RATE_ROWS_LOCK)
+    await session.execute(sqlalchemy.select(lock))
+
+async def insert_returning_ids(
+        session: AsyncSession, table: type[Base], records: list[dict]
+) -> list[int]:
+    if not records:
+        return []
+    hashes = [content_hash(record) for record in records]
+    unique = dict(zip(hashes, records))
+
+    await lock_rate_rows(session)
+    query = sqlalchemy.select(table.hash, table.id).where(table.hash.in_(unique))
+    ids = dict((await session.execute(query)).all())
+
+    missing = [
+        {**record, "hash": hash}
+        for hash, record in sorted(unique.items())
+        if hash not in ids
+    ]
+    if missing:
+        # Inserted in the load transaction, in hash order, so a failed load
+        # leaves nothing behind and concurrent loads sharing rows wait on
+        # each other instead of deadlocking. Rows another load committed in
+        # the meantime conflict and are selected afterwards.
+        connection = await session.connection()
+        query = (
+            insert(table)
+            .on_conflict_do_nothing(index_elements=["hash"])
+            .returning(table.hash, table.id)
+        )
+        ids.update((await connection.execute(query, missing)).all())
+
+        missing = [record["hash"] for record in missing if record["hash"] not in ids]
+        if missing:
+            query = sqlalchemy.select(table.hash, table.id).where(
+                table.hash.in_(missing)
+            )
+            ids.update((await connection.execute(query)).all())
 
+    return [ids[hash] for hash in hashes]
 
 class LocalInterestRates(Base, SerializableTable):
     __tablename__ = "local_interest_rates"
 
     id: Mapped[int] = mapped_column(primary_key=True)
+    hash: Mapped[str] = mapped_column(String(64), unique=True)
     non_indexed: Mapped[float] = mapped_column(Float, nullable=True)
     reference_rate: Mapped[float] = mapped_column(Float, nullable=True)
     belibor_1m: Mapped[float] = mapped_column(Float, nullable=True)
@@ -23,26 +90,26 @@ class LocalInterestRates(Base, SerializableTable):
     total_local: Mapped[float] = mapped_column(Float, nullable=True)
 
     @classmethod
-    async def insert(cls, session: Session, row: DataFrame | Series) -> ResultProxy:
-        query = (
-            insert(cls)
-            .values(
-                non_indexed=or_none(row.iloc[0]),
-                reference_rate=or_none(row.iloc[1]),
-                belibor_1m=or_none(row.iloc[2]),
-                belibor_3m=or_none(row.iloc[3]),
-                belibor_6m=or_none(row.iloc[4]),
-                other_local=or_none(row.iloc[5]),
-                total_local=or_none(row.iloc[6]),
-            )
-            .on_conflict_do_nothing()
+    async def insert_many(cls, session: AsyncSession, rows: DataFrame) -> list[int]:
+        records = to_records(
+            rows,
+            [
+                "non_indexed",
+                "reference_rate",
+                "belibor_1m",
+                "belibor_3m",
+                "belibor_6m",
+                "other_local",
+                "total_local",
+            ],
         )
-        return await session.execute(query)
+        return await insert_returning_ids(session, cls, records)
 
 class ForeignInterestRates(Base, SerializableTable):
     __tablename__ = "foreign_interest_rates"
 
     id: Mapped[int] = mapped_column(primary_key=True)
+    hash: Mapped[str] = mapped_column(String(64), unique=True)
     eur: Mapped[float] = mapped_column(Float, nullable=True)
     chf: Mapped[float] = mapped_column(Float, nullable=True)
     usd: Mapped[float] = mapped_column(Float, nullable=True)
@@ -50,41 +117,128 @@ class ForeignInterestRates(Base, SerializableTable):
     total_foreign: Mapped[float] = mapped_column(Float, nullable=True)
 
     @classmethod
-    async def insert(cls, session: Session, row: DataFrame | Series) -> ResultProxy:
-        query = (
-            insert(cls)
-            .values(
-                eur=or_none(row.iloc[0]),
-                chf=or_none(row.iloc[1]),
-                usd=or_none(row.iloc[2]),
-                other_foreign=or_none(row.iloc[3]),
-                total_foreign=or_none(row.iloc[4]),
-            )
-            .on_conflict_do_nothing()
+    async def insert_many(cls, session: AsyncSession, rows: DataFrame) -> list[int]:
+        records = to_records(
+            rows, ["eur", "chf", "usd", "other_foreign", "total_foreign"]
         )
-        return await session.execute(query)
+        return await insert_returning_ids(session, cls, records)
 
 class InterestRateMaturity(SerializableTable):
     id: Mapped[int] = mapped_column(primary_key=True)
+    hash: Mapped[str] = mapped_column(String(64), unique=True)
     up_to_one: Mapped[float] = mapped_column(Float, nullable=True)
     one_up_to_two: Mapped[float] = mapped_column(Float, nullable=True)
     over_two: Mapped[float] = mapped_column(Float, nullable=True)
 
     @classmethod
-    async def insert(cls, session: Session, row: DataFrame | Series) -> ResultProxy:
-        query = (
-            insert(cls)
-            .values(
-                up_to_one=or_none(row.iloc[0]),
-                one_up_to_two=or_none(row.iloc[1]),
-                over_two=or_none(row.iloc[2]),
-            )
-            .on_conflict_do_nothing()
-        )
-        return await session.execute(query)
+    async def insert_many(cls, session: AsyncSession, rows: DataFrame) -> list[int]:
+        records = to_records(rows, ["up_to_one", "one_up_to_two", "over_two"])
+        return await insert_returning_ids(session, cls, records)
 
 class LocalInterestRateMaturity(InterestRateMaturity, Base):
     __tablename__ = "local_interest_rate_maturity"
 
 class ForeignInterestRateMaturity(InterestRateMaturity, Base):
     __tablename__ = "foreign_interest_rate_maturity"
+
+RATE_TABLES = (
+    LocalInterestRates,
+    ForeignInterestRates,
+    LocalInterestRateMaturity,
+    ForeignInterestRateMaturity,
+)
+
+def rate_references(table: sqlalchemy.Table) -> list[sqlalchemy.Column]:
+    # References are looked up in Base.metadata, so every table pointing at
+    # the rate tables has to be imported before calling this.
+    return [
+        key.parent
+        for parent in Base.metadata.tables.values()
+        for key in parent.foreign_keys
+        if key.column.table is table
+    ]
+
+def migrate_rate_hashes(connection: sqlalchemy.Connection):
+    # create_all does not add columns to existing tables, so rate tables
+    # created before rows were content addressed get the hash column here.
+    # Rows with the same content are merged into the oldest one.
+    inspector = sqlalchemy.inspect(connection)
+    for rates in RATE_TABLES:
+        table = rates.__table__
+        columns = {
+            column["name"]: column for column in inspector.get_columns(table.name)
+        }
+        if "hash" in columns and not columns["hash"]["nullable"]:
+            continue
+        if "hash" not in columns:
+            connection.execute(
+                sqlalchemy.text(f"ALTER TABLE {table.name} ADD COLUMN hash varchar(64)")
+            )
+
+        values = data_columns(table)
+        ids = dict(
+            connection.execute(
+                sqlalchemy.select(table.c.hash, table.c.id).where(
+                    table.c.hash.is_not(None)
+                )
+            ).all()
+        )
+        rows = connection.execute(
+            sqlalchemy.select(table.c.id, *values)
+            .where(table.c.hash.is_(None))
+            .order_by(table.c.id)
+        )
+        hashes = []
+        duplicates = []
+        for id, *row in rows:
+            hash = content_hash(dict(zip([column.name for column in values], row)))
+            if hash in ids:
+                duplicates.append({"duplicate": id, "kept": ids[hash]})
+            else:
+                ids[hash] = id
+                hashes.append({"row_id": id, "row_hash": hash})
+
+        if duplicates:
+            for reference in rate_references(table):
+                connection.execute(
+                    sqlalchemy.update(reference.table)
+                    .where(reference == sqlalchemy.bindparam("duplicate"))
+                    .values({reference.name: sqlalchemy.bindparam("kept")}),
+                    duplicates,
+                )
+            connection.execute(
+                sqlalchemy.delete(table).where(
+                    table.c.id.in_([row["duplicate"] for row in duplicates])
+                )
+            )
+        if hashes:
+            connection.execute(
+                sqlalchemy.update(table)
+                .where(table.c.id == sqlalchemy.bindparam("row_id"))
+                .values(hash=sqlalchemy.bindparam("row_hash")),
+                hashes,
+            )
+        connection.execute(
+            sqlalchemy.text(f"ALTER TABLE {table.name} ALTER COLUMN hash SET NOT NULL")
+        )
+        connection.execute(
+            sqlalchemy.text(
+                f"CREATE UNIQUE INDEX IF NOT EXISTS {table.name}_hash_key "
+                f"ON {table.name} (hash)"
+            )
+        )
+
+async def collect_orphans(session: AsyncSession) -> dict[str, int]:
+    await lock_rate_rows(session, exclusive=True)
+    deleted = {}
+    for child in RATE_TABLES:
+        table = child.__table__
+        references = rate_references(table)
+        query = sqlalchemy.delete(table).where(
+            *(
+                ~sqlalchemy.exists().where(reference == table.c.id)
+                for reference in references
+            )
+        )
+        deleted[table.name] = (await session.execute(query)).rowcount
+    return deleted
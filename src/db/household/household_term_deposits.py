@@ -1,5 +1,5 @@
 from dash.html import Figure
-from pandas import DataFrame, Series, melt
+from pandas import DataFrame, melt
 from plotly import express
 from sqlalchemy import (
 	Float,
@@ -7,13 +7,12 @@ from sqlalchemy import (
 	UniqueConstraint,
 	Integer,
 	ForeignKey,
-	ResultProxy,
 )
-from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import mapped_column, Mapped, relationship, scoped_session
+from sqlalchemy.orm import mapped_column, Mapped, relationship
 
-from src.db import or_none, Base, SerializableTable, SerializableType
+from src.db import KEY_COLUMNS, Base, SerializableTable, SerializableType
+from src.db.layout import PurposeBlock, SheetLayout
 from src.db.generic import LocalInterestRates, ForeignInterestRates
 
 
@@ -49,76 +48,55 @@ class HouseholdTermDeposits(Base, SerializableTable):
 
 	total: Mapped[float] = mapped_column(Float, nullable=True)
 
+	layout = SheetLayout(
+		groups={"local": 7, "foreign": 5, "total": 1},
+		blocks=[
+			PurposeBlock(
+				HouseholdTermDepositPurposes.TOTAL,
+				{"local": range(2, 9), "foreign": range(9, 14)},
+			),
+			PurposeBlock(
+				HouseholdTermDepositPurposes.UP_TO_ONE,
+				{"local": range(14, 21), "foreign": range(21, 26), "total": 26},
+			),
+			PurposeBlock(
+				HouseholdTermDepositPurposes.ONE_UP_TO_TWO,
+				{"local": range(27, 34), "foreign": range(34, 39), "total": 39},
+			),
+			PurposeBlock(
+				HouseholdTermDepositPurposes.OVER_TWO,
+				{"local": range(40, 47), "foreign": range(47, 52), "total": 52},
+			),
+		],
+	)
+
 	@classmethod
-	async def insert(
+	async def insert_block(
 		cls,
 		session: AsyncSession,
 		purpose: HouseholdTermDepositPurposes,
-		year: int,
-		month: int,
-		row: DataFrame | Series,
+		block: DataFrame,
 		**extra_data,
-	) -> ResultProxy:
-		local_rates: ResultProxy = await LocalInterestRates.insert(
-			session, row.iloc[0:7]
-		)
-		local_rates_id = local_rates.inserted_primary_key[0]
-
-		foreign_rates: ResultProxy = await ForeignInterestRates.insert(
-			session, row.iloc[7:12]
-		)
-		foreign_rates_id = foreign_rates.inserted_primary_key[0]
-
-		query = (
-			insert(cls)
-			.values(
-				purpose=purpose.name,
-				year=year,
-				month=month,
-				local_rates_id=local_rates_id,
-				foreign_rates_id=foreign_rates_id,
-				total=or_none(row.iloc[12]),
-			)
-			.on_conflict_do_nothing()
-		)
-		return await session.execute(query)
-
-	@classmethod
-	async def process_frame(cls, session: AsyncSession, frame: DataFrame):
-		from_top, to_bottom = cls._get_start_end_points(frame)
-		date_frame: DataFrame = frame.iloc[from_top:to_bottom, 0:2]
-
-		total_data = frame.iloc[from_top:to_bottom, 2:14]
-		total_data[14] = Series()
-		await cls._process_rows(
-			session, date_frame, total_data, HouseholdTermDepositPurposes.TOTAL
-		)
-
-		housing_data = frame.iloc[from_top:to_bottom, 14:27]
-		await cls._process_rows(
-			session, date_frame, housing_data, HouseholdTermDepositPurposes.UP_TO_ONE
+	):
+		values = block.drop(columns=KEY_COLUMNS)
+		local_rates_ids = await LocalInterestRates.insert_many(
+			session, values.iloc[:, 0:7]
 		)
-
-		consumer_data = frame.iloc[from_top:to_bottom, 27:40]
-		await cls._process_rows(
-			session,
-			date_frame,
-			consumer_data,
-			HouseholdTermDepositPurposes.ONE_UP_TO_TWO,
-		)
-
-		cash_data = frame.iloc[from_top:to_bottom, 40:53]
-		await cls._process_rows(
-			session, date_frame, cash_data, HouseholdTermDepositPurposes.OVER_TWO
+		foreign_rates_ids = await ForeignInterestRates.insert_many(
+			session, values.iloc[:, 7:12]
 		)
 
-	@classmethod
-	def query(cls, session: scoped_session):
-		return (
-			session.query(cls, LocalInterestRates, ForeignInterestRates)
-			.join(LocalInterestRates)
-			.join(ForeignInterestRates)
+		parents = DataFrame(
+			{
+				"purpose": block["purpose"],
+				"year": block["year"],
+				"month": block["month"],
+				"local_rates_id": local_rates_ids,
+				"foreign_rates_id": foreign_rates_ids,
+				"total": values.iloc[:, 12],
+			}
 		)
+		await cls.upsert(session, parents)
 
 	def to_express(self, data: DataFrame, theme: str) -> Figure:
 		columns = ["local_rates.total_local", "foreign_rates.total_foreign", "total"]
@@ -0,0 +1,115 @@
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+
+import numpy
+import pandas
+from pandas import DataFrame
+
+from src.common.month_matcher import months_to_integers
+from src.db import SerializableType
+
+YEAR_COLUMN = 0
+MONTH_COLUMN = 1
+
+
+class LayoutError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class PurposeBlock:
+    purpose: SerializableType
+    columns: dict[str, range | int]
+    extra_data: dict = field(default_factory=dict)
+
+
+@dataclass
+class SheetRows:
+    rows: numpy.ndarray
+    years: numpy.ndarray
+    months: numpy.ndarray
+
+
+@dataclass
+class SheetLayout:
+    groups: dict[str, int]
+    blocks: list[PurposeBlock]
+
+    def __post_init__(self):
+        # Compile every block into a row of sheet column indices, laid out as
+        # the concatenation of the groups. Missing groups point at -1, which
+        # extract() maps to an all-NaN column.
+        take = numpy.full((len(self.blocks), sum(self.groups.values())), -1)
+        for i, block in enumerate(self.blocks):
+            offset = 0
+            for group, width in self.groups.items():
+                columns = block.columns.get(group)
+                if isinstance(columns, int):
+                    columns = range(columns, columns + 1)
+                if columns is not None:
+                    if len(columns) != width:
+                        raise LayoutError(
+                            f"{block.purpose.name}: group '{group}' has "
+                            f"{len(columns)} columns, expected {width}"
+                        )
+                    take[i, offset:offset + width] = columns
+                offset += width
+        self.take = take
+        self.width = max(int(take.max()) + 1, MONTH_COLUMN + 1)
+
+    def validate_width(self, frame: DataFrame):
+        if frame.shape[1] < self.width:
+            raise LayoutError(
+                f"Sheet has {frame.shape[1]} columns, layout needs {self.width}"
+            )
+
+    def validate_values(self, values: numpy.ndarray):
+        if not len(values):
+            raise LayoutError("Sheet has no rows with a recognizable month")
+
+        empty = numpy.isnan(values).all(axis=(0, 2))
+        if empty.any():
+            purposes = [
+                block.purpose.name for block, e in zip(self.blocks, empty) if e
+            ]
+            raise LayoutError(
+                f"Blocks {purposes} have no numeric data, "
+                "the layout does not match the sheet"
+            )
+
+    def find_rows(self, frame: DataFrame) -> SheetRows:
+        self.validate_width(frame)
+        months = months_to_integers(frame.iloc[:, MONTH_COLUMN])
+        years = pandas.to_numeric(frame.iloc[:, YEAR_COLUMN], errors="coerce")
+        years = years.where(months.notna()).ffill()
+
+        rows = months.notna().to_numpy()
+        for i in frame.index[rows & years.isna().to_numpy()]:
+            print(f"Error processing row {i}: missing year")
+        rows &= years.notna().to_numpy()
+
+        return SheetRows(
+            rows,
+            years[rows].astype("int64").to_numpy(),
+            months[rows].astype("int64").to_numpy(),
+        )
+
+    def extract(
+        self, frame: DataFrame, sheet_rows: SheetRows | None = None
+    ) -> Iterator[tuple[PurposeBlock, DataFrame]]:
+        if sheet_rows is None:
+            sheet_rows = self.find_rows(frame)
+
+        frame = frame.iloc[sheet_rows.rows, :self.width]
+        numeric = frame.apply(pandas.to_numeric, errors="coerce")
+        data = numeric.to_numpy(dtype="float64")
+        padded = numpy.column_stack([data, numpy.full(len(data), numpy.nan)])
+        values = padded[:, self.take]
+        self.validate_values(values)
+
+        for i, block in enumerate(self.blocks):
+            records = DataFrame(values[:, i, :])
+            records.insert(0, "purpose", block.purpose.name)
+            records.insert(0, "month", sheet_rows.months)
+            records.insert(0, "year", sheet_rows.years)
+            yield block, records
@@ -1,5 +1,5 @@
 from dash.html import Figure
-from pandas import DataFrame, Series, concat, melt
+from pandas import DataFrame, melt
 from plotly import express
 from sqlalchemy import (
     Float,
@@ -7,13 +7,12 @@ from sqlalchemy import (
     UniqueConstraint,
     Integer,
     ForeignKey,
-    ResultProxy,
 )
-from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import mapped_column, Mapped, relationship, scoped_session
+from sqlalchemy.orm import mapped_column, Mapped, relationship
 
-from src.db import or_none, Base, SerializableTable, SerializableType
+from src.db import KEY_COLUMNS, Base, SerializableTable, SerializableType
+from src.db.layout import PurposeBlock, SheetLayout
 from src.db.generic import LocalInterestRateMaturity, ForeignInterestRateMaturity
 
 
@@ -51,117 +50,92 @@ class NonFinancialTermDepositsBySize(Base, SerializableTable):
     local_total: Mapped[float] = mapped_column(Float, nullable=True)
     foreign_total: Mapped[float] = mapped_column(Float, nullable=True)
 
+    layout = SheetLayout(
+        groups={"local": 3, "local_total": 1, "foreign": 3, "foreign_total": 1},
+        blocks=[
+            # PurposeBlock(
+            #     NonFinancialTermDepositPurposesBySize.TOTAL,
+            #     {"local_total": 18, "foreign_total": 35},
+            # ),
+            PurposeBlock(
+                NonFinancialTermDepositPurposesBySize.MICRO,
+                {
+                    "local": range(2, 5),
+                    "local_total": 5,
+                    "foreign": range(19, 22),
+                    "foreign_total": 22,
+                },
+            ),
+            PurposeBlock(
+                NonFinancialTermDepositPurposesBySize.SMALL,
+                {
+                    "local": range(6, 9),
+                    "local_total": 9,
+                    "foreign": range(23, 26),
+                    "foreign_total": 26,
+                },
+            ),
+            PurposeBlock(
+                NonFinancialTermDepositPurposesBySize.MEDIUM,
+                {
+                    "local": range(10, 13),
+                    "local_total": 13,
+                    "foreign": range(27, 30),
+                    "foreign_total": 30,
+                },
+            ),
+            PurposeBlock(
+                NonFinancialTermDepositPurposesBySize.LARGE,
+                {
+                    "local": range(14, 17),
+                    "local_total": 17,
+                    "foreign": range(31, 34),
+                    "foreign_total": 34,
+                },
+            ),
+        ],
+    )
+
     @classmethod
-    async def insert(
+    async def insert_block(
         cls,
         session: AsyncSession,
         purpose: NonFinancialTermDepositPurposesBySize,
-        year: int,
-        month: int,
-        row: DataFrame | Series,
+        block: DataFrame,
         **extra_data,
-    ) -> ResultProxy:
+    ):
+        values = block.drop(columns=KEY_COLUMNS)
         # if purpose == NonFinancialTermDepositPurposesBySize.TOTAL:
-        #     local_interest_rate_maturity_id = None
-        #     local_total = row.iloc[0]
+        #     local_interest_rate_maturity_ids = None
+        #     local_total = values.iloc[:, 0]
         #
-        #     foreign_interest_rate_maturity_id = None
-        #     foreign_total = row.iloc[1]
+        #     foreign_interest_rate_maturity_ids = None
+        #     foreign_total = values.iloc[:, 1]
         # else:
-        #     local_interest_rate_maturity: ResultProxy = (
-        #         await LocalInterestRateMaturity.insert(session, row.iloc[0:3])
-        #     )
-        #     local_interest_rate_maturity_id = (
-        #         local_interest_rate_maturity.inserted_primary_key[0]
-        #     )
-        #     local_total = or_none(row.iloc[3])
-        #
-        #     foreign_interest_rate_maturity: ResultProxy = (
-        #         await ForeignInterestRateMaturity.insert(session, row.iloc[4:7])
-        #     )
-        #     foreign_interest_rate_maturity_id = (
-        #         foreign_interest_rate_maturity.inserted_primary_key[0]
-        #     )
-        #     foreign_total = or_none(row.iloc[7])
-
-        local_interest_rate_maturity: ResultProxy = (
-            await LocalInterestRateMaturity.insert(session, row.iloc[0:3])
-        )
-        local_interest_rate_maturity_id = (
-            local_interest_rate_maturity.inserted_primary_key[0]
-        )
-        local_total = or_none(row.iloc[3])
-
-        foreign_interest_rate_maturity: ResultProxy = (
-            await ForeignInterestRateMaturity.insert(session, row.iloc[4:7])
-        )
-        foreign_interest_rate_maturity_id = (
-            foreign_interest_rate_maturity.inserted_primary_key[0]
-        )
-        foreign_total = or_none(row.iloc[7])
-
-        query = (
-            insert(cls)
-            .values(
-                purpose=purpose.name,
-                year=year,
-                month=month,
-                local_interest_rate_maturity_id=local_interest_rate_maturity_id,
-                foreign_interest_rate_maturity_id=foreign_interest_rate_maturity_id,
-                local_total=local_total,
-                foreign_total=foreign_total,
-            )
-            .on_conflict_do_nothing()
-        )
-        return await session.execute(query)
-
-    @classmethod
-    async def process_frame(cls, session: AsyncSession, frame: DataFrame):
-        from_top, from_bottom = cls._get_start_end_points(frame)
-        date_frame: DataFrame = frame.iloc[from_top:from_bottom, 0:2]
-
-        # local_total = frame.iloc[from_top:from_bottom, 18:19]
-        # foreign_total = frame.iloc[from_top:from_bottom, 35:36]
-        # total_data = concat([local_total, foreign_total], axis=1)
-        # await cls._process_rows(
-        #     session, date_frame, total_data, NonFinancialTermDepositPurposesBySize.TOTAL
-        # )
-
-        local_micro_data = frame.iloc[from_top:from_bottom, 2:6]
-        foreign_micro_data = frame.iloc[from_top:from_bottom, 19:23]
-        micro_data = concat([local_micro_data, foreign_micro_data], axis=1)
-        await cls._process_rows(
-            session, date_frame, micro_data, NonFinancialTermDepositPurposesBySize.MICRO
-        )
-
-        local_small_data = frame.iloc[from_top:from_bottom, 6:10]
-        foreign_small_data = frame.iloc[from_top:from_bottom, 23:27]
-        small_data = concat([local_small_data, foreign_small_data], axis=1)
-        await cls._process_rows(
-            session, date_frame, small_data, NonFinancialTermDepositPurposesBySize.SMALL
-        )
+        #     ...
 
-        local_medium_data = frame.iloc[from_top:from_bottom, 10:14]
-        foreign_medium_data = frame.iloc[from_top:from_bottom, 27:31]
-        medium_data = concat([local_medium_data, foreign_medium_data], axis=1)
-        await cls._process_rows(
-            session, date_frame, medium_data, NonFinancialTermDepositPurposesBySize.MEDIUM
+        local_interest_rate_maturity_ids = (
+            await LocalInterestRateMaturity.insert_many(session, values.iloc[:, 0:3])
         )
+        local_total = values.iloc[:, 3]
 
-        local_large_data = frame.iloc[from_top:from_bottom, 14:18]
-        foreign_large_data = frame.iloc[from_top:from_bottom, 31:35]
-        large_data = concat([local_large_data, foreign_large_data], axis=1)
-        await cls._process_rows(
-            session, date_frame, large_data, NonFinancialTermDepositPurposesBySize.LARGE
+        foreign_interest_rate_maturity_ids = (
+            await ForeignInterestRateMaturity.insert_many(session, values.iloc[:, 4:7])
         )
-
-    @classmethod
-    def query(cls, session: scoped_session):
-        return (
-            session.query(cls, LocalInterestRateMaturity, ForeignInterestRateMaturity)
-            .join(LocalInterestRateMaturity)
-            .join(ForeignInterestRateMaturity)
+        foreign_total = values.iloc[:, 7]
+
+        parents = DataFrame(
+            {
+                "purpose": block["purpose"],
+                "year": block["year"],
+                "month": block["month"],
+                "local_interest_rate_maturity_id": local_interest_rate_maturity_ids,
+                "foreign_interest_rate_maturity_id": foreign_interest_rate_maturity_ids,
+                "local_total": local_total,
+                "foreign_total": foreign_total,
+            }
         )
+        await cls.upsert(session, parents)
 
     def to_express(self, data: DataFrame, theme: str) -> Figure:
         columns = [
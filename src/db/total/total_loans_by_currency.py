@@ -1,10 +1,10 @@
-from pandas import DataFrame, Series
-from sqlalchemy import UniqueConstraint, Integer, Float, ResultProxy, Enum
-from sqlalchemy.dialects.postgresql import insert
+from pandas import DataFrame
+from sqlalchemy import UniqueConstraint, Integer, Float, Enum
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import mapped_column, Mapped, Session
+from sqlalchemy.orm import mapped_column, Mapped
 
-from src.db import Base, SerializableTable, SerializableType
+from src.db import Base, SerializableTable, SerializableType, KEY_COLUMNS
+from src.db.layout import PurposeBlock, SheetLayout
 
 
 class TotalLoanPurposesByCurrency(SerializableType):
@@ -29,63 +29,49 @@ class TotalLoansByCurrency(Base, SerializableTable):
     non_financial_total: Mapped[float] = mapped_column(Float, nullable=True)
     total: Mapped[float] = mapped_column(Float, nullable=True)
 
+    layout = SheetLayout(
+        groups={"household_total": 1, "non_financial_total": 1, "total": 1},
+        blocks=[
+            PurposeBlock(
+                TotalLoanPurposesByCurrency.RSD,
+                {"household_total": 2, "non_financial_total": 3, "total": 4},
+            ),
+            PurposeBlock(
+                TotalLoanPurposesByCurrency.EUR,
+                {"household_total": 5, "non_financial_total": 6, "total": 7},
+            ),
+            PurposeBlock(
+                TotalLoanPurposesByCurrency.CHF,
+                {"household_total": 8, "non_financial_total": 9, "total": 10},
+            ),
+            PurposeBlock(
+                TotalLoanPurposesByCurrency.TOTAL_FOREIGN,
+                {"household_total": 11, "non_financial_total": 12, "total": 13},
+            ),
+            PurposeBlock(
+                TotalLoanPurposesByCurrency.TOTAL,
+                {"household_total": 14, "non_financial_total": 15, "total": 16},
+            ),
+        ],
+    )
+
     @classmethod
-    async def insert(
+    async def insert_block(
         cls,
         session: AsyncSession,
         purpose: TotalLoanPurposesByCurrency,
-        year: int,
-        month: int,
-        row: DataFrame | Series,
+        block: DataFrame,
         **extra_data,
-    ) -> ResultProxy:
-        household_total = row.iloc[0]
-        non_financial_total = row.iloc[1]
-        total = row.iloc[2]
-
-        query = (
-            insert(cls)
-            .values(
-                purpose=purpose.name,
-                year=year,
-                month=month,
-                household_total=household_total,
-                non_financial_total=non_financial_total,
-                total=total,
-            )
-            .on_conflict_do_nothing()
-        )
-        return await session.execute(query)
-
-    @classmethod
-    async def process_frame(cls, session: Session, frame: DataFrame):
-        from_top, to_bottom = cls._get_start_end_points(frame)
-        date_frame: DataFrame = frame.iloc[from_top:to_bottom, 0:2]
-
-        rsd_data = frame.iloc[from_top:to_bottom, 2:5]
-        await cls._process_rows(
-            session, date_frame, rsd_data, TotalLoanPurposesByCurrency.RSD
-        )
-
-        eur_data = frame.iloc[from_top:to_bottom, 5:8]
-        await cls._process_rows(
-            session, date_frame, eur_data, TotalLoanPurposesByCurrency.EUR
-        )
-
-        chf_data = frame.iloc[from_top:to_bottom, 8:11]
-        await cls._process_rows(
-            session, date_frame, chf_data, TotalLoanPurposesByCurrency.CHF
-        )
-
-        total_foreign_data = frame.iloc[from_top:to_bottom, 11:14]
-        await cls._process_rows(
-            session,
-            date_frame,
-            total_foreign_data,
-            TotalLoanPurposesByCurrency.TOTAL_FOREIGN,
-        )
-
-        total_data = frame.iloc[from_top:to_bottom, 14:17]
-        await cls._process_rows(
-            session, date_frame, total_data, TotalLoanPurposesByCurrency.TOTAL
+    ):
+        values = block.drop(columns=KEY_COLUMNS)
+        records = DataFrame(
+            {
+                "purpose": block["purpose"],
+                "year": block["year"],
+                "month": block["month"],
+                "household_total": values.iloc[:, 0],
+                "non_financial_total": values.iloc[:, 1],
+                "total": values.iloc[:, 2],
+            }
         )
+        await cls.upsert(session, records)
@@ -1,115 +1,323 @@
+import argparse
 import asyncio
-import hashlib
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass
 from os import getenv
 from pathlib import Path
 
-import pandas
-import requests
 from dotenv import load_dotenv
-from narwhals import DataFrame
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from pandas import DataFrame
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, AsyncEngine
 
-from src.db import Base, SerializableTable
+from src.db import Base, DatasetCatalog, EtlMetadata, SerializableTable
+from src.db.generic import collect_orphans, migrate_rate_hashes
 from src.db.household import HouseholdLoans, HouseholdTermDeposits
 from src.db.non_financial import (
-    NonFinancialLoans,
-    NonFinancialTermDepositsBySize,
-    NonFinancialTermDeposits,
+	NonFinancialLoans,
+	NonFinancialTermDepositsBySize,
+	NonFinancialTermDeposits,
 )
 from src.db.total import TotalLoans, TotalLoansByCurrency
+from src.etl import parsed_cache
+from src.etl.report import PROFILE_DIR, REPORT_DIR, RunReport
+from src.etl.snapshot import SNAPSHOT_PATH, export_snapshot
+from src.etl.workbook import Manifest, download, parse_sheet
 
 load_dotenv()
 DATABASE_URL = f"postgresql+asyncpg://{getenv('POSTGRES_USER')}:{getenv('POSTGRES_PASSWORD')}@{getenv('POSTGRES_HOST')}:{getenv('POSTGRES_PORT')}/{getenv('POSTGRES_DB')}"
+ETL_CONCURRENCY = int(getenv("ETL_CONCURRENCY", "5"))
+ETL_REVISION_WINDOW = int(getenv("ETL_REVISION_WINDOW", "3"))
+CACHE_DIR = ".temp/excel/"
+NBS_BASE_URL = getenv(
+	"NBS_BASE_URL",
+	"https://www.nbs.rs/export/sites/NBS_site/documents/statistika/monetarni_sektor/",
+)
 
 
-def get_cached_data(
-	url,
-	sheet_name: str | int = 0,
-	cache_dir: str = ".temp/excel/",
-	force_download: bool = False,
-) -> DataFrame:
-	cache_dir = Path(cache_dir)
-	cache_dir.mkdir(exist_ok=True, parents=True)
-
-	# url_hash = hashlib.md5(url.encode()).hexdigest()
-	# cache_path = cache_dir / f"{url_hash}.xls"
-	cache_path = cache_dir / url.split("/")[-1]
-
-	if force_download or not cache_path.exists():
-		print(f"Downloading from: {url}")
-		response = requests.get(url)
-		response.raise_for_status()
-
-		with open(cache_path, "wb") as f:
-			f.write(response.content)
-
-	return pandas.read_excel(
-		cache_path,
-		sheet_name=sheet_name,
-		na_values=["-", " ", "", " -", "- "],
-		header=None,
-	)
+@dataclass
+class Workbook:
+	filename: str
+	sheet_name: str
+	table: type[SerializableTable]
+
+	@property
+	def url(self) -> str:
+		return NBS_BASE_URL.rstrip("/") + "/" + self.filename
+
+
+WORKBOOKS = [
+	Workbook(
+		"SBMS_ks_3.xls",
+		"Weighted IR on loans-New Bus.",
+		HouseholdLoans,
+	),
+	Workbook(
+		"SBMS_ks_6.xls",
+		"Weigted IR on deposits-New Bus.",
+		HouseholdTermDeposits,
+	),
+	Workbook(
+		"SBMS_ks_4.xlsx",
+		"Weighted IR on loans-New Bus.",
+		NonFinancialLoans,
+	),
+	Workbook(
+		"SBMS_ks_7.xlsx",
+		"Weghted IR on deposits-New Bus.",
+		NonFinancialTermDeposits,
+	),
+	Workbook(
+		"SBMS_ks_5.xls",
+		"Weighted IR on deposits-New Bus",
+		NonFinancialTermDepositsBySize,
+	),
+	# Workbook(
+	# 	"SBMS18.xls",
+	# 	"Weighted IR on loans-New Bus.",
+	# 	TotalLoans,
+	# ),
+	# Workbook(
+	# 	"SBMS25.xls",
+	# 	"Weighted IR on Loans-New Bus.",
+	# 	TotalLoansByCurrency,
+	# ),
+]
+
+
+@dataclass
+class Options:
+	force: bool = False
+	revision_window: int | None = None
+	profile: bool = False
+	collect_orphans_only: bool = False
+	snapshot: str | None = None
+	snapshot_only: bool = False
+
+
+async def offload(options: Options, executor: Executor | None, function, *args):
+	# cProfile only sees the calling thread, so profiled runs stay inline.
+	if options.profile:
+		return function(*args)
+	if executor is None:
+		return await asyncio.to_thread(function, *args)
+	return await asyncio.get_running_loop().run_in_executor(executor, function, *args)
 
 
 async def process_file(
-	session: AsyncSession, url: str, sheet_name: str, table: type[SerializableTable]
+	engine: AsyncEngine,
+	executor: Executor | None,
+	semaphore: asyncio.Semaphore,
+	manifest: Manifest,
+	report: RunReport,
+	workbook: Workbook,
+	options: Options,
 ):
-	frame: DataFrame = get_cached_data(url, sheet_name)
-	await table.process_frame(session, frame)
+	name = workbook.table.__tablename__
+	layout = workbook.table.layout
 
+	with report.stage(workbook.filename, name, "download"):
+		downloaded = await offload(
+			options, None, download, workbook.url, manifest, CACHE_DIR, options.force
+		)
+	if not downloaded.changed:
+		print(f"Skipping unchanged workbook: {workbook.filename}")
+		report.count(name, "skipped")
+		return
 
-async def async_main():
-	engine = create_async_engine(DATABASE_URL, future=True)
+	with report.stage(workbook.filename, name, "parse"):
+		frame: DataFrame | None = await offload(
+			options,
+			None,
+			parsed_cache.load,
+			downloaded.sha256,
+			workbook.sheet_name,
+			layout.width,
+		)
+		report.count(name, "parse_cache_hits", frame is not None)
+		if frame is None:
+			frame = await offload(
+				options,
+				executor,
+				parse_sheet,
+				downloaded.path,
+				downloaded.sha256,
+				workbook.sheet_name,
+				layout.width,
+			)
+
+	with report.stage(workbook.filename, name, "boundary detection"):
+		sheet_rows = layout.find_rows(frame)
+	with report.stage(workbook.filename, name, "transform"):
+		blocks = list(layout.extract(frame, sheet_rows))
+	report.count(name, "rows", sum(len(block) for _, block in blocks))
+
+	async with semaphore:
+		with report.stage(workbook.filename, name, "load"):
+			async with AsyncSession(engine) as session:
+				if options.revision_window is not None:
+					session.info["incremental"] = True
+					session.info["revision_window"] = options.revision_window
+				async with session.begin():
+					connection = await session.connection()
+					connection.info["report_table"] = name
+					# Pooled connections keep their info, so failed loads untag too.
+					try:
+						loaded = await workbook.table.load_blocks(session, blocks)
+						if loaded:
+							await workbook.table.refresh_read_model(session)
+							await DatasetCatalog.refresh(session, workbook.table)
+							await EtlMetadata.bump_generation(session)
+					finally:
+						connection.info.pop("report_table", None)
+		report.count(name, "rows_loaded", loaded)
+
+	manifest.update(workbook.filename, loaded_sha256=downloaded.sha256)
+
+
+async def remove_orphans(engine: AsyncEngine, report: RunReport):
+	async with AsyncSession(engine) as session, session.begin():
+		deleted = await collect_orphans(session)
+	for name, count in deleted.items():
+		report.count(name, "orphans_deleted", count)
+		print(f"Deleted {count} orphaned rows from {name}")
+
+
+async def write_snapshot(engine: AsyncEngine, path: str):
+	tables = [workbook.table for workbook in WORKBOOKS]
+	counts = await export_snapshot(engine, tables, path)
+	print(f"Snapshot of {sum(counts.values())} rows written to: {path}")
+
+
+async def async_main(options: Options, report_path: str | None = None):
+	engine = create_async_engine(
+		DATABASE_URL,
+		future=True,
+		pool_size=ETL_CONCURRENCY,
+		max_overflow=0,
+	)
+	report = RunReport(options.profile)
+	report.track_statements(engine.sync_engine)
 
 	async with engine.begin() as connection:
 		await connection.run_sync(Base.metadata.create_all)
+		await connection.run_sync(migrate_rate_hashes)
+		for workbook in WORKBOOKS:
+			await workbook.table.create_read_model(connection)
+			if not await DatasetCatalog.has_table(connection, workbook.table):
+				await DatasetCatalog.refresh(connection, workbook.table)
+				await EtlMetadata.bump_generation(connection)
 
-	async with AsyncSession(engine) as session:
-		async with session.begin():
-			await process_file(
-				session,
-				"https://www.nbs.rs/export/sites/NBS_site/documents/statistika/monetarni_sektor/SBMS_ks_3.xls",
-				"Weighted IR on loans-New Bus.",
-				HouseholdLoans,
-			)
-			await process_file(
-				session,
-				"https://www.nbs.rs/export/sites/NBS_site/documents/statistika/monetarni_sektor/SBMS_ks_6.xls",
-				"Weigted IR on deposits-New Bus.",
-				HouseholdTermDeposits,
-			)
-			await process_file(
-				session,
-				"https://www.nbs.rs/export/sites/NBS_site/documents/statistika/monetarni_sektor/SBMS_ks_4.xlsx",
-				"Weighted IR on loans-New Bus.",
-				NonFinancialLoans,
-			)
-			await process_file(
-				session,
-				"https://www.nbs.rs/export/sites/NBS_site/documents/statistika/monetarni_sektor/SBMS_ks_7.xlsx",
-				"Weghted IR on deposits-New Bus.",
-				NonFinancialTermDeposits,
+	if options.collect_orphans_only or options.snapshot_only:
+		if options.collect_orphans_only:
+			await remove_orphans(engine, report)
+		if options.snapshot_only:
+			await write_snapshot(engine, options.snapshot or SNAPSHOT_PATH)
+		await engine.dispose()
+		print(f"Run report written to: {report.write(report_path)}")
+		return
+
+	semaphore = asyncio.Semaphore(ETL_CONCURRENCY)
+	manifest = Manifest(Path(CACHE_DIR))
+	if options.profile:
+		# Profiles are per stage, so run everything in this process, one
+		# workbook at a time, to keep each profile limited to its own stage.
+		results = []
+		for workbook in WORKBOOKS:
+			results += await asyncio.gather(
+				process_file(
+					engine, None, semaphore, manifest, report, workbook, options
+				),
+				return_exceptions=True,
 			)
-			await process_file(
-				session,
-				"https://www.nbs.rs/export/sites/NBS_site/documents/statistika/monetarni_sektor/SBMS_ks_5.xls",
-				"Weighted IR on deposits-New Bus",
-				NonFinancialTermDepositsBySize,
+	else:
+		with ProcessPoolExecutor(
+			max_workers=min(ETL_CONCURRENCY, len(WORKBOOKS)),
+			mp_context=multiprocessing.get_context("spawn"),
+		) as executor:
+			results = await asyncio.gather(
+				*(
+					process_file(
+						engine, executor, semaphore, manifest, report, workbook, options
+					)
+					for workbook in WORKBOOKS
+				),
+				return_exceptions=True,
 			)
-			# await process_file(
-			# 	session,
-			# 	"https://www.nbs.rs/export/sites/NBS_site/documents/statistika/monetarni_sektor/SBMS18.xls",
-			# 	"Weighted IR on loans-New Bus.",
-			# 	TotalLoans,
-			# )
-			# await process_file(
-			# 	session,
-			# 	"https://www.nbs.rs/export/sites/NBS_site/documents/statistika/monetarni_sektor/SBMS25.xls",
-			# 	"Weighted IR on Loans-New Bus.",
-			# 	TotalLoansByCurrency,
-			# )
-		await session.commit()
+
+	await remove_orphans(engine, report)
+	if options.snapshot:
+		await write_snapshot(engine, options.snapshot)
+	await engine.dispose()
+	parsed_cache.evict()
+
+	failed = False
+	for workbook, result in zip(WORKBOOKS, results):
+		if isinstance(result, BaseException):
+			print(f"Error processing {workbook.table.__tablename__}: {result!r}")
+			report.count(workbook.table.__tablename__, "failed")
+			failed = True
+
+	print(f"Run report written to: {report.write(report_path)}")
+	if failed:
+		raise SystemExit(1)
 
 
 if __name__ == "__main__":
-	asyncio.run(async_main())
+	parser = argparse.ArgumentParser(prog="python -m src.etl")
+	parser.add_argument(
+		"--force",
+		action="store_true",
+		help="re-download and reload every workbook, even if unchanged",
+	)
+	parser.add_argument(
+		"--incremental",
+		action="store_true",
+		help="only load months newer than the latest stored month per purpose",
+	)
+	parser.add_argument(
+		"--revision-window",
+		type=int,
+		default=ETL_REVISION_WINDOW,
+		help="number of already stored months to re-load in incremental mode",
+	)
+	parser.add_argument(
+		"--profile",
+		action="store_true",
+		help=f"write cProfile stats for every stage to {PROFILE_DIR}",
+	)
+	parser.add_argument(
+		"--report",
+		help=f"path of the JSON run report (default: a new file in {REPORT_DIR})",
+	)
+	parser.add_argument(
+		"--collect-orphans",
+		action="store_true",
+		help="only delete interest rate rows no longer referenced by any table",
+	)
+	parser.add_argument(
+		"--snapshot",
+		nargs="?",
+		const=SNAPSHOT_PATH,
+		help=f"after the run, export a SQLite snapshot (default: {SNAPSHOT_PATH})",
+	)
+	parser.add_argument(
+		"--snapshot-only",
+		action="store_true",
+		help="only export the snapshot, without loading any workbooks",
+	)
+	arguments = parser.parse_args()
+
+	asyncio.run(
+		async_main(
+			Options(
+				arguments.force,
+				arguments.revision_window if arguments.incremental else None,
+				arguments.profile,
+				arguments.collect_orphans,
+				arguments.snapshot,
+				arguments.snapshot_only,
+			),
+			arguments.report,
+		)
+	)
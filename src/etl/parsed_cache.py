@@ -0,0 +1,94 @@
+import hashlib
+import time
+from os import getenv
+from pathlib import Path
+
+import pandas
+from pandas import DataFrame
+from pyarrow import feather
+
+PARSED_CACHE_DIR = ".temp/parsed/"
+PARSED_CACHE_MAX_AGE_DAYS = float(getenv("ETL_PARSED_CACHE_MAX_AGE_DAYS", "30"))
+PARSED_CACHE_MAX_MB = float(getenv("ETL_PARSED_CACHE_MAX_MB", "256"))
+# Bumped when the parsed frame changes shape, so older entries are skipped.
+PARSED_CACHE_VERSION = 2
+
+
+def cache_path(
+	sha256: str,
+	sheet_name: str | int,
+	columns: int | None = None,
+	cache_dir: str = PARSED_CACHE_DIR,
+) -> Path:
+	key = f"{PARSED_CACHE_VERSION}:{sha256}:{sheet_name}:{columns}"
+	key = hashlib.sha256(key.encode()).hexdigest()
+	return Path(cache_dir) / f"{key}.feather"
+
+
+def load(
+	sha256: str,
+	sheet_name: str | int,
+	columns: int | None = None,
+	cache_dir: str = PARSED_CACHE_DIR,
+) -> DataFrame | None:
+	path = cache_path(sha256, sheet_name, columns, cache_dir)
+	if not path.exists():
+		return None
+
+	path.touch()
+	frame = feather.read_table(path, memory_map=True).to_pandas()
+	frame.columns = frame.columns.astype(int)
+	return frame
+
+
+def store(
+	frame: DataFrame,
+	sha256: str,
+	sheet_name: str | int,
+	columns: int | None = None,
+	cache_dir: str = PARSED_CACHE_DIR,
+):
+	path = cache_path(sha256, sheet_name, columns, cache_dir)
+	path.parent.mkdir(exist_ok=True, parents=True)
+
+	# Arrow columns must have a single type, so sheet columns mixing header
+	# text with numbers are stored as strings and coerced again on transform.
+	columns = {}
+	for column, values in frame.items():
+		if values.dtype == object:
+			numbers = pandas.to_numeric(values, errors="coerce")
+			if numbers.notna().sum() == values.notna().sum():
+				values = numbers.astype("float64")
+			else:
+				values = values.astype(str).where(values.notna(), None)
+		columns[str(column)] = values
+
+	temp_path = path.with_suffix(".tmp")
+	feather.write_feather(DataFrame(columns), temp_path, compression="uncompressed")
+	temp_path.replace(path)
+
+
+def evict(
+	cache_dir: str = PARSED_CACHE_DIR,
+	max_age_days: float = PARSED_CACHE_MAX_AGE_DAYS,
+	max_mb: float = PARSED_CACHE_MAX_MB,
+):
+	cache_dir = Path(cache_dir)
+	if not cache_dir.exists():
+		return
+
+	now = time.time()
+	files = []
+	for path in cache_dir.glob("*.feather"):
+		stat = path.stat()
+		if now - stat.st_mtime > max_age_days * 86400:
+			path.unlink(missing_ok=True)
+		else:
+			files.append((stat.st_mtime, stat.st_size, path))
+
+	total = sum(size for _, size, _ in files)
+	for _, size, path in sorted(files):
+		if total <= max_mb * 1024 * 1024:
+			break
+		path.unlink(missing_ok=True)
+		total -= size
@@ -0,0 +1,81 @@
+import cProfile
+import json
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import UTC, datetime
+from pathlib import Path
+from time import perf_counter
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+REPORT_DIR = ".temp/reports/"
+PROFILE_DIR = ".temp/profile/"
+
+
+class RunReport:
+	def __init__(self, profile: bool = False):
+		self.started = datetime.now(UTC)
+		self.start_time = perf_counter()
+		self.profile = profile
+		self.stages: list[dict] = []
+		self.counters: dict[str, dict[str, int]] = defaultdict(lambda: defaultdict(int))
+		self.profile_paths: list[str] = []
+
+	@contextmanager
+	def stage(self, workbook: str, table: str, name: str):
+		profiler = cProfile.Profile() if self.profile else None
+		start = perf_counter()
+		if profiler:
+			profiler.enable()
+		try:
+			yield
+		finally:
+			if profiler:
+				profiler.disable()
+			self.stages.append(
+				{
+					"workbook": workbook,
+					"table": table,
+					"stage": name,
+					"seconds": perf_counter() - start,
+				}
+			)
+			if profiler:
+				path = Path(PROFILE_DIR) / f"{table}-{name.replace(' ', '_')}.prof"
+				path.parent.mkdir(exist_ok=True, parents=True)
+				profiler.dump_stats(path)
+				self.profile_paths.append(str(path))
+
+	def count(self, table: str, name: str, value: int = 1):
+		self.counters[table][name] += value
+
+	def track_statements(self, engine: Engine):
+		@event.listens_for(engine, "before_cursor_execute")
+		def count_statement(connection, cursor, statement, parameters, context, executemany):
+			table = connection.info.get("report_table")
+			if table is not None:
+				self.count(table, "statements")
+
+	def to_dict(self) -> dict:
+		totals = defaultdict(float)
+		for stage in self.stages:
+			totals[stage["stage"]] += stage["seconds"]
+
+		return {
+			"started": self.started.isoformat(),
+			"seconds": perf_counter() - self.start_time,
+			"stage_totals": dict(totals),
+			"stages": self.stages,
+			"counters": {table: dict(counts) for table, counts in self.counters.items()},
+			"profiles": self.profile_paths,
+		}
+
+	def write(self, path: str | Path | None = None) -> Path:
+		if path is None:
+			timestamp = self.started.strftime("%Y%m%dT%H%M%SZ")
+			path = Path(REPORT_DIR) / f"etl-{timestamp}.json"
+		path = Path(path)
+		path.parent.mkdir(exist_ok=True, parents=True)
+		path.write_text(json.dumps(self.to_dict(), indent=2))
+		return path
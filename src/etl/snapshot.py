@@ -0,0 +1,75 @@
+import os
+from os import getenv
+from pathlib import Path
+
+import sqlalchemy
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from src.db import DatasetCatalog, EtlMetadata, SerializableTable
+
+SNAPSHOT_PATH = getenv("ETL_SNAPSHOT_PATH", ".temp/snapshot.sqlite")
+SNAPSHOT_CHUNK_ROWS = 5000
+
+
+def snapshot_metadata(
+	tables: list[type[SerializableTable]],
+) -> tuple[sqlalchemy.MetaData, dict[str, sqlalchemy.TableClause]]:
+	metadata = sqlalchemy.MetaData()
+	sources = {}
+	for table in (DatasetCatalog.__table__, EtlMetadata.__table__):
+		table.to_metadata(metadata)
+		sources[table.name] = table
+	for table in tables:
+		view = table.read_model()
+		# Clustered on (purpose, year, month), the order every range query
+		# filters in, like the covering index on the Postgres view.
+		sqlalchemy.Table(
+			view.name,
+			metadata,
+			*(sqlalchemy.Column(column.name, column.type) for column in view.c),
+			sqlalchemy.PrimaryKeyConstraint("purpose", "year", "month"),
+			sqlite_with_rowid=False,
+		)
+		sources[view.name] = view
+	return metadata, sources
+
+
+async def export_snapshot(
+	engine: AsyncEngine,
+	tables: list[type[SerializableTable]],
+	path: str = SNAPSHOT_PATH,
+) -> dict[str, int]:
+	path = Path(path)
+	path.parent.mkdir(parents=True, exist_ok=True)
+	temporary = path.with_name(path.name + ".tmp")
+	temporary.unlink(missing_ok=True)
+
+	metadata, sources = snapshot_metadata(tables)
+	snapshot = sqlalchemy.create_engine(f"sqlite:///{temporary}")
+	metadata.create_all(snapshot)
+
+	counts = {}
+	# One transaction, so the snapshot matches a single generation.
+	async with engine.connect() as connection:
+		await connection.execution_options(isolation_level="REPEATABLE READ")
+		async with connection.begin():
+			with snapshot.begin() as target:
+				for name, source in sources.items():
+					table = metadata.tables[name]
+					result = await connection.stream(
+						sqlalchemy.select(*source.c).order_by(*table.primary_key)
+					)
+					counts[name] = 0
+					async for rows in result.partitions(SNAPSHOT_CHUNK_ROWS):
+						target.execute(
+							sqlalchemy.insert(table), [row._asdict() for row in rows]
+						)
+						counts[name] += len(rows)
+
+	with snapshot.connect() as target:
+		target.exec_driver_sql("ANALYZE")
+		target.exec_driver_sql("VACUUM")
+	snapshot.dispose()
+	# Readers never see a half-written file.
+	os.replace(temporary, path)
+	return counts
@@ -0,0 +1,173 @@
+import hashlib
+import json
+import threading
+from array import array
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+from math import nan
+from pathlib import Path
+
+import numpy
+import openpyxl
+import pandas
+import requests
+from pandas import DataFrame
+
+from src.etl import parsed_cache
+
+NA_VALUES = ["-", " ", "", " -", "- "]
+DATE_COLUMNS = 2
+MANIFEST_NAME = "manifest.json"
+
+
+class Manifest:
+	def __init__(self, cache_dir: Path):
+		self.path = cache_dir / MANIFEST_NAME
+		self.lock = threading.Lock()
+		if self.path.exists():
+			self.entries: dict[str, dict] = json.loads(self.path.read_text())
+		else:
+			self.entries = {}
+
+	def get(self, name: str) -> dict:
+		with self.lock:
+			return dict(self.entries.get(name, {}))
+
+	def update(self, name: str, **values):
+		with self.lock:
+			self.entries.setdefault(name, {}).update(values)
+			temp_path = self.path.with_suffix(".tmp")
+			temp_path.write_text(json.dumps(self.entries, indent=2))
+			temp_path.replace(self.path)
+
+
+@dataclass
+class Download:
+	path: Path
+	sha256: str
+	changed: bool
+
+
+def download(
+	url: str,
+	manifest: Manifest,
+	cache_dir: str = ".temp/excel/",
+	force_download: bool = False,
+) -> Download:
+	cache_dir = Path(cache_dir)
+	cache_dir.mkdir(exist_ok=True, parents=True)
+
+	name = url.split("/")[-1]
+	cache_path = cache_dir / name
+	entry = manifest.get(name)
+
+	headers = {}
+	cached = cache_path.exists() and cache_path.stat().st_size == entry.get("size")
+	if not force_download and cached:
+		if entry.get("etag"):
+			headers["If-None-Match"] = entry["etag"]
+		if entry.get("last_modified"):
+			headers["If-Modified-Since"] = entry["last_modified"]
+
+	if headers:
+		print(f"Checking for updates: {url}")
+	else:
+		print(f"Downloading from: {url}")
+	response = requests.get(url, headers=headers)
+	if response.status_code == 304:
+		print(f"Not modified: {url}")
+		sha256 = entry["sha256"]
+	else:
+		response.raise_for_status()
+
+		temp_path = cache_path.with_suffix(cache_path.suffix + ".part")
+		with open(temp_path, "wb") as f:
+			f.write(response.content)
+		temp_path.replace(cache_path)
+
+		sha256 = hashlib.sha256(response.content).hexdigest()
+		manifest.update(
+			name,
+			url=url,
+			etag=response.headers.get("ETag"),
+			last_modified=response.headers.get("Last-Modified"),
+			size=len(response.content),
+			sha256=sha256,
+		)
+
+	changed = force_download or entry.get("loaded_sha256") != sha256
+	return Download(cache_path, sha256, changed)
+
+
+def iter_xlsx_rows(
+	path: Path, sheet_name: str | int = 0, columns: int | None = None
+) -> Iterator[tuple]:
+	workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+	try:
+		if isinstance(sheet_name, int):
+			sheet = workbook.worksheets[sheet_name]
+		else:
+			sheet = workbook[sheet_name]
+		yield from sheet.iter_rows(max_col=columns, values_only=True)
+	finally:
+		workbook.close()
+
+
+def frame_from_rows(rows: Iterable[tuple], columns: int) -> DataFrame:
+	dates = [[] for _ in range(DATE_COLUMNS)]
+	values = [array("d") for _ in range(columns - DATE_COLUMNS)]
+	# openpyxl pads rows to the requested width, so the real sheet width is
+	# the last column holding any cell, as read_excel would report it.
+	width = DATE_COLUMNS
+	for row in rows:
+		row = tuple(row) + (None,) * (columns - len(row))
+		for i in range(DATE_COLUMNS):
+			value = row[i]
+			dates[i].append(None if value in NA_VALUES else value)
+		for i, value in enumerate(row[DATE_COLUMNS:columns]):
+			if value is not None:
+				width = max(width, DATE_COLUMNS + i + 1)
+			values[i].append(value if isinstance(value, (int, float)) else nan)
+
+	frame = DataFrame({i: dates[i] for i in range(DATE_COLUMNS)})
+	for i, column in enumerate(values[:width - DATE_COLUMNS]):
+		frame[DATE_COLUMNS + i] = numpy.frombuffer(column, dtype="float64")
+	return frame
+
+
+def read_sheet(
+	path: Path, sheet_name: str | int = 0, columns: int | None = None
+) -> DataFrame:
+	if columns is not None and Path(path).suffix == ".xlsx":
+		return frame_from_rows(iter_xlsx_rows(path, sheet_name, columns), columns)
+
+	return pandas.read_excel(
+		path,
+		sheet_name=sheet_name,
+		na_values=NA_VALUES,
+		header=None,
+		usecols=None if columns is None else range(columns),
+	)
+
+
+def parse_sheet(
+	path: Path, sha256: str, sheet_name: str | int = 0, columns: int | None = None
+) -> DataFrame:
+	frame = read_sheet(path, sheet_name, columns)
+	parsed_cache.store(frame, sha256, sheet_name, columns)
+	return frame
+
+
+def get_cached_data(
+	url,
+	sheet_name: str | int = 0,
+	cache_dir: str = ".temp/excel/",
+	force_download: bool = False,
+	columns: int | None = None,
+) -> DataFrame:
+	manifest = Manifest(Path(cache_dir))
+	downloaded = download(url, manifest, cache_dir, force_download)
+	frame = parsed_cache.load(downloaded.sha256, sheet_name, columns)
+	if frame is None:
+		frame = parse_sheet(downloaded.path, downloaded.sha256, sheet_name, columns)
+	return frame
@@ -1,16 +1,50 @@
+from os import getenv
+
 import plotly.express
-from dash import Dash, html, dcc, Output, Input, dash_table
+import plotly.io
+from dash import Dash, html, dcc, Output, Input, State, dash_table
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
+from pandas import melt
 
 from src.common import MONTH_NAMES
+from src.common.metrics import metrics
+from src.db import EtlMetadata, bucket_size
+from src.db.cache import ResultCache
+from src.db.comparison import get_comparison
+from src.frontend.type.measure import Measures
 from src.frontend.type.quarter import FiscalSelections
+from src.frontend.type.resolution import Resolutions
 from src.frontend.type.table_type import TableTypes
 
+CHART_MAX_POINTS = int(getenv("CHART_MAX_POINTS", "120"))
+THEME_TEMPLATES = {"light": "plotly_white", "dark": "plotly_dark"}
+
+# Series payloads hold a figure without a template, which is applied in the
+# browser together with the selected period.
+series_cache = ResultCache()
+
+
+def period_label(year: int, month: int, step: int, single_year: bool) -> str:
+    if step == 1:
+        return MONTH_NAMES[month] if single_year else f"{MONTH_NAMES[month]} {year}"
+    if step == 3:
+        return f"Q{(month - 1) // 3 + 1} {year}"
+    if step % 12 == 0:
+        return str(year)
+    return f"{MONTH_NAMES[month]} {year}"
+
 def create_dash(server: Flask, db: SQLAlchemy):
     app = Dash(__name__, server=server, assets_folder="assets")
     app.title = "NBS kamatne stope"
 
+    purpose_options = {
+        table_type.value.table: {
+            selection.name: selection.value for selection in table_type.value.purpose
+        }
+        for table_type in TableTypes
+    }
+
     app.layout = html.Div(
         id="main-container",
         children=[
@@ -61,20 +95,69 @@ def create_dash(server: Flask, db: SQLAlchemy):
                                     ),
                                 ],
                             ),
+                            html.Div(
+                                children=[
+                                    html.Label("Do godine (opciono):"),
+                                    dcc.Dropdown(
+                                        [],
+                                        None,
+                                        id="end-year-selection-dropdown",
+                                    ),
+                                ],
+                            ),
                             html.Div(
                                 children=[
                                     html.Label("Izaberite vremenski period:"),
                                     FiscalSelections.get_dropdown(),
                                 ],
                             ),
+                            html.Div(
+                                children=[
+                                    html.Label("Izaberite prikaz:"),
+                                    Resolutions.get_dropdown(),
+                                ],
+                            ),
+                        ],
+                    ),
+                    html.Div(
+                        id="comparison",
+                        className="dropdown-containers",
+                        children=[
+                            html.Div(
+                                children=[
+                                    html.Label("Uporedite sa (opciono):"),
+                                    TableTypes.get_comparison_dropdown(),
+                                ],
+                            ),
+                            html.Div(
+                                children=[
+                                    html.Label("Stopa za poređenje:"),
+                                    Measures.get_dropdown(),
+                                ],
+                            ),
                         ],
                     ),
                 ],
             ),
             html.Hr(className="separator"),
-            html.Div(id="graph-container"),
+            html.Div(
+                id="graph-container",
+                children=[
+                    dcc.Graph(id="graph-content"),
+                    dash_table.DataTable(id="data-table", export_format="csv"),
+                ],
+            ),
 
             dcc.Store(id="theme-store", storage_type="local"),
+            dcc.Store(id="series-store"),
+            FiscalSelections.get_store(),
+            dcc.Store(
+                id="template-store",
+                data={
+                    theme: plotly.io.templates[template].to_plotly_json()
+                    for theme, template in THEME_TEMPLATES.items()
+                },
+            ),
         ],
     )
 
@@ -85,90 +168,202 @@ def create_dash(server: Flask, db: SQLAlchemy):
         Input("theme-toggle-button", "n_clicks"),
     )
 
+    app.clientside_callback(
+        "window.dash_clientside.display.render",
+        Output("graph-content", "figure"),
+        Output("data-table", "columns"),
+        Output("data-table", "data"),
+        Input("series-store", "data"),
+        Input("fiscal-selection-dropdown", "value"),
+        Input("theme-store", "data"),
+        State("fiscal-selection-store", "data"),
+        State("template-store", "data"),
+    )
+
     @app.callback(
         Output("table-purpose-dropdown", "options"),
         Input("table-type-dropdown", "value"),
     )
+    @metrics.stage("callback")
     def update_table_purpose(table_type):
         if table_type is None:
             return {}
 
+        table_type = TableTypes[table_type].value
+        purposes = table_type.table.get_purposes(db.session)
         return {
-            selection.name: selection.value
-            for selection in TableTypes[table_type].value.purpose
+            name: label
+            for name, label in purpose_options[table_type.table].items()
+            if name in purposes
         }
 
     @app.callback(
         Output("year-selection-dropdown", "options"),
+        Output("end-year-selection-dropdown", "options"),
         Input("table-type-dropdown", "value"),
+        Input("table-purpose-dropdown", "value"),
     )
-    def update_years(table_type):
+    @metrics.stage("callback")
+    def update_years(table_type, table_purpose):
         if table_type is None:
-            return {}
+            return {}, {}
+
+        table_type = TableTypes[table_type].value
+        purpose = table_type.purpose.__members__.get(table_purpose)
+        years = table_type.table.get_years(db.session, purpose)
+        return years, years
+
+    def build_series(table_type, purpose, years, resolution):
+        table = TableTypes[table_type].value.table
+        # Whole years are loaded, the selected period is cut out in the browser.
+        start = (years[0], 1)
+        end = (years[-1], 12)
+        step = bucket_size(start, end, resolution, CHART_MAX_POINTS)
+        with metrics.stage("query"):
+            data = table.get_range(
+                db.session, purpose, start, end, resolution, CHART_MAX_POINTS
+            )
+        data["month_name"] = [
+            period_label(year, month, step, years[0] == years[-1])
+            for year, month in zip(data["year"], data["month"])
+        ]
+
+        with metrics.stage("figure"):
+            figure = to_figure(table.to_express(table, data, "none"), table.unit)
+        return to_payload(years, step, data, figure, table.get_columns(table))
+
+    def build_comparison(keys, years, resolution, measure):
+        series = []
+        labels = {}
+        for index, key in enumerate(keys):
+            table_type, purpose_name = key.split(".")
+            table_type = TableTypes[table_type].value
+            purpose = table_type.purpose[purpose_name]
+            series.append((table_type.table, purpose))
+            labels[f"series_{index}"] = f"{table_type.translation}: {purpose.value}"
+
+        start = (years[0], 1)
+        end = (years[-1], 12)
+        step = bucket_size(start, end, resolution, CHART_MAX_POINTS)
+        with metrics.stage("query"):
+            data = get_comparison(
+                db.session,
+                series,
+                Measures[measure].value.columns,
+                start,
+                end,
+                resolution,
+                CHART_MAX_POINTS,
+            )
+        # One column per series over all periods, so every trace lines up
+        # with the rows the browser slices.
+        data = (
+            data.pivot(index=["year", "month"], columns="series", values="value")
+            .reindex(columns=range(len(series)))
+            .rename(columns=lambda index: f"series_{index}")
+            .reset_index()
+        )
+        data["month_name"] = [
+            period_label(year, month, step, years[0] == years[-1])
+            for year, month in zip(data["year"], data["month"])
+        ]
+
+        with metrics.stage("figure"):
+            melted = melt(
+                data,
+                id_vars=["month_name"],
+                value_vars=list(labels),
+                var_name="key",
+                value_name="rate",
+            )
+            melted["key"] = melted["key"].map(labels)
+            units = {table.unit for table, _ in series}
+            figure = to_figure(
+                plotly.express.line(
+                    melted,
+                    x="month_name",
+                    y="rate",
+                    color="key",
+                    labels={"month_name": "Mesec", "rate": "Kamatna stopa", "key": ""},
+                    template="none",
+                ),
+                units.pop() if len(units) == 1 else "",
+            )
+        columns = [
+            {"id": "year", "name": "Godina"},
+            {"id": "month_name", "name": "Mesec"},
+            *({"id": key, "name": label} for key, label in labels.items()),
+        ]
+        return to_payload(years, step, data, figure, columns)
+
+    def to_figure(figure, unit):
+        figure.add_annotation(
+            x=0,
+            y=-0.1,
+            text=unit,
+            showarrow=False,
+            xref="paper",
+            yref="paper",
+        )
+        figure = figure.to_plotly_json()
+        figure["layout"].pop("template", None)
+        return figure
 
-        return TableTypes[table_type].value.table.get_years(db.session)
+    def to_payload(years, step, data, figure, columns):
+        # Some tables list columns they do not have, which stay out of the table.
+        columns = [column for column in columns if column["id"] in data.columns]
+        values = data[[column["id"] for column in columns]]
+        return {
+            "years": years,
+            "periods": (data["year"] * 12 + data["month"] - 1).tolist(),
+            "step": step,
+            "figure": figure,
+            "columns": columns,
+            "data": values.astype(object).where(values.notna(), None).to_dict("list"),
+        }
 
     @app.callback(
-        Output("graph-container", "children"),
+        Output("series-store", "data"),
         Input("table-type-dropdown", "value"),
         Input("table-purpose-dropdown", "value"),
         Input("year-selection-dropdown", "value"),
-        Input("fiscal-selection-dropdown", "value"),
-        Input("theme-store", "data"),
+        Input("end-year-selection-dropdown", "value"),
+        Input("resolution-dropdown", "value"),
+        Input("comparison-dropdown", "value"),
+        Input("measure-dropdown", "value"),
     )
-    def update_display(
-		table_type, table_purpose, year_selection, fiscal_selection, theme
+    @metrics.stage("callback")
+    def update_series(
+		table_type,
+		table_purpose,
+		year_selection,
+		end_year_selection,
+		resolution,
+		comparison,
+		measure,
     ):
-        theme = "plotly_dark" if theme == "dark" else "plotly_white"
-
-        if (
-			table_type is None
-			or table_purpose is None
-			or year_selection is None
-			or fiscal_selection is None
-        ):
-            return [
-                dcc.Graph(
-                    id="graph-content",
-                    figure=plotly.express.bar(None, template=theme)
-                ),
-                dash_table.DataTable(
-                    id="data-table",
-                    export_format="csv",
-                ),
-            ]
+        if table_type is None or table_purpose is None or year_selection is None:
+            return None
 
-        table = TableTypes[table_type].value.table
         purpose_type = TableTypes[table_type].value.purpose
         purpose = purpose_type[table_purpose]
-        month_range = FiscalSelections[fiscal_selection].value.range
+        resolution = Resolutions[resolution or Resolutions.MONTH.name].value.months
+        years = sorted((year_selection, end_year_selection or year_selection))
 
-        data = table.get_data(db.session, purpose, year_selection, month_range)
-        data["month_name"] = data["month"].map(MONTH_NAMES)
+        if comparison:
+            # The selected series first, then the compared ones, in one query.
+            keys = tuple(dict.fromkeys([f"{table_type}.{table_purpose}", *comparison]))
+            measure = measure or Measures.LOCAL.name
+            return series_cache.get(
+                ("comparison", keys, *years, resolution, measure),
+                lambda: build_comparison(keys, years, resolution, measure),
+                lambda: EtlMetadata.get_generation(db.session),
+            )
 
-        columns = table.get_columns(table)
-        table_data = data.to_dict("records")
-        figure = table.to_express(table, data, theme)
-        figure.add_annotation(
-            x=0,
-            y=-0.1,
-            text="U % na godišnjem nivou",
-            showarrow=False,
-            xref="paper",
-            yref="paper",
+        return series_cache.get(
+            (table_type, table_purpose, *years, resolution),
+            lambda: build_series(table_type, purpose, years, resolution),
+            lambda: EtlMetadata.get_generation(db.session),
         )
 
-        return [
-            dcc.Graph(
-                id="graph-content",
-                figure=figure,
-            ),
-            dash_table.DataTable(
-                id="data-table",
-                columns=columns,
-                data=table_data,
-                export_format="csv",
-            ),
-        ]
-
     return app
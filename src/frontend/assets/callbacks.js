@@ -14,5 +14,71 @@ window.dash_clientside = Object.assign({}, window.dash_clientside, {
 			localStorage.setItem('theme', currentTheme);
 			return currentTheme;
 		}
+	},
+	display: {
+		render: function (series, fiscalSelection, theme, fiscalRanges, templates) {
+			const template = templates[theme === 'dark' ? 'dark' : 'light'];
+			if (!series || !fiscalSelection) {
+				return [{data: [], layout: {template: template}}, [], []];
+			}
+
+			// Rows are ordered by period, so the selection is one slice. Every
+			// row is a bucket of `step` months, kept when it overlaps the
+			// selection, so a quarter still shows the year it falls in.
+			const months = fiscalRanges[fiscalSelection];
+			const start = series.years[0] * 12 + months[0] - 1;
+			const end = series.years[1] * 12 + months[1] - 1;
+			const rows = series.periods.length;
+			let first = series.periods.findIndex(period => period + series.step - 1 >= start);
+			let last = series.periods.findIndex(period => period > end);
+			first = first === -1 ? rows : first;
+			last = last === -1 ? rows : last;
+
+			const data = series.figure.data.map(trace => {
+				const sliced = Object.assign({}, trace);
+				for (const key of ['x', 'y', 'customdata', 'text', 'hovertext']) {
+					const values = decodeArray(trace[key]);
+					if (values && values.length === rows) {
+						sliced[key] = values.slice(first, last);
+					}
+				}
+				return sliced;
+			});
+			const records = [];
+			for (let row = first; row < last; row++) {
+				const record = {};
+				for (const column in series.data) {
+					record[column] = series.data[column][row];
+				}
+				records.push(record);
+			}
+
+			const layout = Object.assign({}, series.figure.layout, {template: template});
+			return [{data: data, layout: layout}, series.columns, records];
+		}
 	}
 });
+
+const TYPED_ARRAYS = {
+	f8: Float64Array,
+	f4: Float32Array,
+	i4: Int32Array,
+	u4: Uint32Array,
+	i2: Int16Array,
+	u2: Uint16Array,
+	i1: Int8Array,
+	u1: Uint8Array,
+};
+
+// Plotly serializes numeric arrays as base64 typed arrays ({dtype, bdata}).
+function decodeArray(values) {
+	if (Array.isArray(values) || !values || typeof values.bdata !== 'string') {
+		return values;
+	}
+	const Type = TYPED_ARRAYS[values.dtype];
+	if (!Type || (values.shape && String(values.shape).includes(','))) {
+		return undefined;
+	}
+	const bytes = Uint8Array.from(atob(values.bdata), char => char.charCodeAt(0));
+	return Array.from(new Type(bytes.buffer));
+}
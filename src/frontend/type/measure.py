@@ -0,0 +1,25 @@
+from dataclasses import dataclass
+from enum import Enum
+
+from dash import dcc
+
+
+@dataclass
+class Measure:
+    columns: tuple[str, ...]
+    translation: str
+
+
+class Measures(Enum):
+    LOCAL = Measure(("local_rates.total_local", "local_total"), "Ukupno lokalno")
+    FOREIGN = Measure(("foreign_rates.total_foreign", "foreign_total"), "Ukupno strano")
+    TOTAL = Measure(("total",), "Ukupno")
+
+    @classmethod
+    def get_dropdown(cls):
+        return dcc.Dropdown(
+            {selection.name: selection.value.translation for selection in cls},
+            cls.LOCAL.name,
+            id="measure-dropdown",
+            clearable=False,
+        )
@@ -24,3 +24,13 @@ class FiscalSelections(Enum):
             None,
             id="fiscal-selection-dropdown",
         )
+
+    @classmethod
+    def get_store(cls):
+        return dcc.Store(
+            id="fiscal-selection-store",
+            data={
+                selection.name: [selection.value.range[0], selection.value.range[-1]]
+                for selection in cls
+            },
+        )
@@ -0,0 +1,25 @@
+from dataclasses import dataclass
+from enum import Enum
+
+from dash import dcc
+
+
+@dataclass
+class Resolution:
+    months: int
+    translation: str
+
+
+class Resolutions(Enum):
+    MONTH = Resolution(1, "Mesečno")
+    QUARTER = Resolution(3, "Kvartalni prosek")
+    YEAR = Resolution(12, "Godišnji prosek")
+
+    @classmethod
+    def get_dropdown(cls):
+        return dcc.Dropdown(
+            {selection.name: selection.value.translation for selection in cls},
+            cls.MONTH.name,
+            id="resolution-dropdown",
+            clearable=False,
+        )
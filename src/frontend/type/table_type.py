@@ -4,6 +4,18 @@ from enum import Enum
 from dash import dcc
 
 from src.db import SerializableTable, SerializableType
+from src.db.analytics import (
+    HouseholdLoansRollingAverage,
+    HouseholdLoansYearOverYear,
+    HouseholdSpread,
+    HouseholdTermDepositsRollingAverage,
+    HouseholdTermDepositsYearOverYear,
+    NonFinancialLoansRollingAverage,
+    NonFinancialLoansYearOverYear,
+    NonFinancialSpread,
+    NonFinancialTermDepositsRollingAverage,
+    NonFinancialTermDepositsYearOverYear,
+)
 from src.db.household import (
     HouseholdLoans,
     HouseholdLoanPurposes,
@@ -65,6 +77,56 @@ class TableTypes(Enum):
         NonFinancialTermDepositPurposesBySize,
         "Kamatne stope na primljene oročene depozite nefinancijskog sektora, po veličini preduzeća",
     )
+    HOUSEHOLD_SPREAD = TableType(
+        HouseholdSpread,
+        HouseholdLoanPurposes,
+        "Razlika kamatnih stopa na kredite i oročene depozite stanovništva",
+    )
+    NON_FINANCIAL_SPREAD = TableType(
+        NonFinancialSpread,
+        NonFinancialLoanPurposes,
+        "Razlika kamatnih stopa na kredite i oročene depozite nefinancijskog sektora",
+    )
+    HOUSEHOLD_LOANS_YOY = TableType(
+        HouseholdLoansYearOverYear,
+        HouseholdLoanPurposes,
+        "Godišnja promena kamatnih stopa na kredite stanovništvu",
+    )
+    HOUSEHOLD_TERM_DEPOSITS_YOY = TableType(
+        HouseholdTermDepositsYearOverYear,
+        HouseholdTermDepositPurposes,
+        "Godišnja promena kamatnih stopa na oročene depozite stanovništva",
+    )
+    NON_FINANCIAL_LOANS_YOY = TableType(
+        NonFinancialLoansYearOverYear,
+        NonFinancialLoanPurposes,
+        "Godišnja promena kamatnih stopa na kredite nefinancijskom sektoru",
+    )
+    NON_FINANCIAL_TERM_DEPOSITS_YOY = TableType(
+        NonFinancialTermDepositsYearOverYear,
+        NonFinancialTermDepositPurposes,
+        "Godišnja promena kamatnih stopa na oročene depozite nefinancijskog sektora",
+    )
+    HOUSEHOLD_LOANS_ROLLING = TableType(
+        HouseholdLoansRollingAverage,
+        HouseholdLoanPurposes,
+        "Pokretni 12-mesečni prosek kamatnih stopa na kredite stanovništvu",
+    )
+    HOUSEHOLD_TERM_DEPOSITS_ROLLING = TableType(
+        HouseholdTermDepositsRollingAverage,
+        HouseholdTermDepositPurposes,
+        "Pokretni 12-mesečni prosek kamatnih stopa na oročene depozite stanovništva",
+    )
+    NON_FINANCIAL_LOANS_ROLLING = TableType(
+        NonFinancialLoansRollingAverage,
+        NonFinancialLoanPurposes,
+        "Pokretni 12-mesečni prosek kamatnih stopa na kredite nefinancijskom sektoru",
+    )
+    NON_FINANCIAL_TERM_DEPOSITS_ROLLING = TableType(
+        NonFinancialTermDepositsRollingAverage,
+        NonFinancialTermDepositPurposes,
+        "Pokretni 12-mesečni prosek kamatnih stopa na oročene depozite nefinancijskog sektora",
+    )
     # TOTAL_LOANS = TableType(
     #     TotalLoans,
     #     TotalLoanPurposes,
@@ -83,3 +145,18 @@ class TableTypes(Enum):
             None,
             id="table-type-dropdown",
         )
+
+    @classmethod
+    def get_comparison_dropdown(cls):
+        return dcc.Dropdown(
+            {
+                f"{selection.name}.{purpose.name}": (
+                    f"{selection.value.translation}: {purpose.value}"
+                )
+                for selection in cls
+                for purpose in selection.value.purpose
+            },
+            [],
+            id="comparison-dropdown",
+            multi=True,
+        )
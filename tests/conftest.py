@@ -0,0 +1,183 @@
+import os
+import tempfile
+import threading
+from datetime import UTC, datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+import sqlalchemy
+from pandas import DataFrame
+
+TEMP_DIR = Path(tempfile.mkdtemp(prefix="banking-tests-"))
+# The backend reads these when it is first imported, so they are set before
+# any test module imports it.
+os.environ["DB_SNAPSHOT"] = str(TEMP_DIR / "snapshot.sqlite")
+os.environ["METRICS_DIR"] = str(TEMP_DIR / "metrics")
+os.environ.pop("RESULT_CACHE_SHARED_DIR", None)
+
+YEARS = (2012, 2013, 2014)
+# One month of housing loans is missing, so window functions have a gap.
+MISSING = ("HOUSING_LOANS", 2013, 3)
+DEPOSIT_RATE = 2.0
+
+
+def loan_rate(year: int, month: int) -> float:
+    # Linear in the period, so derived series have exact expected values.
+    return (year * 12 + month - 1) / 12
+
+
+MONTH_NAMES = [
+    "januar",
+    "februar",
+    "mart",
+    "april",
+    "maj",
+    "jun",
+    "jul",
+    "avgust",
+    "septembar",
+    "oktobar",
+    "novembar",
+    "decembar",
+]
+
+
+def cell(year: int, month: int, column: int) -> float:
+    return year + month / 100 + column / 1e4
+
+
+def sheet(months: list[tuple[int, int]], width: int, value=cell) -> DataFrame:
+    # A sheet as the NBS publishes it: a header row, the year only on the
+    # first month of each year and month names in the second column.
+    rows = [["Godina", "Mesec", *(f"Kolona {i}" for i in range(2, width))]]
+    previous = None
+    for year, month in months:
+        rows.append(
+            [
+                year if year != previous else None,
+                MONTH_NAMES[month - 1],
+                *(value(year, month, column) for column in range(2, width)),
+            ]
+        )
+        previous = year
+    return DataFrame(rows)
+
+
+class Workbooks(BaseHTTPRequestHandler):
+    # Set per server by the fixture.
+    files: dict[str, tuple[bytes, str]]
+    requests: list[dict]
+    base_url: str
+
+    def do_GET(self):
+        type(self).requests.append(dict(self.headers))
+        if self.path not in self.files:
+            self.send_error(404)
+            return
+        content, etag = self.files[self.path]
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(content)))
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", "Mon, 01 Jan 2024 00:00:00 GMT")
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def workbook_server():
+    # A local stand-in for the NBS site, serving whatever the test puts in
+    # `files` under a path, with an ETag.
+    handler = type("Handler", (Workbooks,), {"files": {}, "requests": []})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    handler.base_url = f"http://127.0.0.1:{server.server_port}"
+    yield handler
+    server.shutdown()
+    server.server_close()
+
+
+def write_snapshot(path: Path):
+    from src.db.household import HouseholdLoans, HouseholdTermDeposits
+    from src.etl.snapshot import snapshot_metadata
+
+    tables = [HouseholdLoans, HouseholdTermDeposits]
+    metadata, _ = snapshot_metadata(tables)
+    engine = sqlalchemy.create_engine(f"sqlite:///{path}")
+    metadata.create_all(engine)
+
+    catalog = []
+    with engine.begin() as connection:
+        for table, purposes, rate in (
+            (HouseholdLoans, ("TOTAL", "HOUSING_LOANS"), loan_rate),
+            (HouseholdTermDeposits, ("TOTAL",), lambda year, month: DEPOSIT_RATE),
+        ):
+            view = metadata.tables[table.read_model().name]
+            rows = [
+                {
+                    **{
+                        column.name: rate(year, month)
+                        for column in view.c
+                        if column.name not in ("purpose", "year", "month")
+                    },
+                    "purpose": purpose,
+                    "year": year,
+                    "month": month,
+                }
+                for purpose in purposes
+                for year in YEARS
+                for month in range(1, 13)
+                if (purpose, year, month) != MISSING
+            ]
+            connection.execute(sqlalchemy.insert(view), rows)
+            catalog += [
+                {
+                    "table_name": table.__tablename__,
+                    "purpose": purpose,
+                    "year": year,
+                    "min_month": 1,
+                    "max_month": 12,
+                }
+                for purpose in purposes
+                for year in YEARS
+            ]
+        connection.execute(
+            sqlalchemy.insert(metadata.tables["dataset_catalog"]), catalog
+        )
+        connection.execute(
+            sqlalchemy.insert(metadata.tables["etl_metadata"]),
+            {"id": 1, "generation": 1, "updated_at": datetime.now(UTC)},
+        )
+    engine.dispose()
+
+
+@pytest.fixture(scope="session")
+def app():
+    path = Path(os.environ["DB_SNAPSHOT"])
+    if not path.exists():
+        write_snapshot(path)
+
+    from src.backend.__main__ import app
+
+    return app
+
+
+@pytest.fixture
+def session(app):
+    from src.backend.__main__ import db
+
+    with app.app_context():
+        yield db.session
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
@@ -0,0 +1,53 @@
+import math
+
+import pytest
+
+from src.db.analytics import (
+    HouseholdLoansRollingAverage,
+    HouseholdLoansYearOverYear,
+    HouseholdSpread,
+)
+from src.db.household import HouseholdLoanPurposes
+from tests.conftest import DEPOSIT_RATE, loan_rate
+
+
+def by_month(frame):
+    return {(row.year, row.month): row.total for row in frame.itertuples(index=False)}
+
+
+def test_year_over_year(session):
+    frame = HouseholdLoansYearOverYear.get_range(
+        session, HouseholdLoanPurposes.TOTAL, (2013, 1), (2014, 12)
+    )
+    totals = by_month(frame)
+    assert len(totals) == 24
+    assert all(value == pytest.approx(1.0) for value in totals.values())
+
+
+def test_year_over_year_skips_missing_month(session):
+    frame = HouseholdLoansYearOverYear.get_range(
+        session, HouseholdLoanPurposes.HOUSING_LOANS, (2014, 1), (2014, 12)
+    )
+    totals = by_month(frame)
+    # No March 2013 to compare with, and no shift onto February or April.
+    assert math.isnan(totals[(2014, 3)])
+    assert totals[(2014, 2)] == pytest.approx(1.0)
+    assert totals[(2014, 4)] == pytest.approx(1.0)
+
+
+def test_rolling_average(session):
+    frame = HouseholdLoansRollingAverage.get_range(
+        session, HouseholdLoanPurposes.TOTAL, (2013, 1), (2014, 12)
+    )
+    for (year, month), value in by_month(frame).items():
+        assert value == pytest.approx(loan_rate(year, month) - 5.5 / 12)
+
+
+def test_spread(session):
+    frame = HouseholdSpread.get_range(
+        session, HouseholdLoanPurposes.TOTAL, (2012, 1), (2014, 12)
+    )
+    totals = by_month(frame)
+    assert len(totals) == 36
+    for (year, month), value in totals.items():
+        assert value == pytest.approx(loan_rate(year, month) - DEPOSIT_RATE)
@@ -0,0 +1,183 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from pandas import DataFrame
+from pandas.testing import assert_frame_equal
+
+from src.db.cache import ResultCache
+
+KEY = ("household_loans", "TOTAL", (2014, 1), (2014, 12), 1)
+
+
+def generation():
+    return 1
+
+
+async def generation_async():
+    return 1
+
+
+class SlowLoad:
+    def __init__(self, value="value", delay=0.2):
+        self.value = value
+        self.delay = delay
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def __call__(self):
+        with self.lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        return self.value
+
+    async def load_async(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return self.value
+
+
+def test_hit():
+    cache = ResultCache()
+    load = SlowLoad(delay=0)
+    assert cache.get(KEY, load, generation) == "value"
+    assert cache.get(KEY, load, generation) == "value"
+    assert load.calls == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_new_generation_clears():
+    cache = ResultCache(check_interval=0)
+    load = SlowLoad(delay=0)
+    cache.get(KEY, load, generation)
+    cache.get(KEY, load, lambda: 2)
+    assert load.calls == 2
+
+
+def test_single_flight():
+    cache = ResultCache()
+    load = SlowLoad()
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(lambda _: cache.get(KEY, load, generation), range(8)))
+    assert results == ["value"] * 8
+    assert load.calls == 1
+    assert not cache.flights
+
+
+def test_single_flight_error():
+    cache = ResultCache()
+    calls = []
+
+    def load():
+        calls.append(None)
+        time.sleep(0.2)
+        raise RuntimeError("query failed")
+
+    def get(_):
+        with pytest.raises(RuntimeError, match="query failed"):
+            cache.get(KEY, load, generation)
+
+    with ThreadPoolExecutor(4) as pool:
+        list(pool.map(get, range(4)))
+    assert len(calls) == 1
+    # Failures are not cached.
+    assert cache.get(KEY, lambda: "value", generation) == "value"
+
+
+def test_async_single_flight():
+    cache = ResultCache()
+    load = SlowLoad()
+
+    async def main():
+        return await asyncio.gather(
+            *(cache.get_async(KEY, load.load_async, generation_async) for _ in range(8))
+        )
+
+    assert asyncio.run(main()) == ["value"] * 8
+    assert load.calls == 1
+    assert not cache.async_flights
+
+
+def test_async_cancelled_leader():
+    cache = ResultCache()
+    load = SlowLoad()
+
+    async def main():
+        leader = asyncio.create_task(
+            cache.get_async(KEY, load.load_async, generation_async)
+        )
+        await asyncio.sleep(0.05)
+        follower = asyncio.create_task(
+            cache.get_async(KEY, load.load_async, generation_async)
+        )
+        await asyncio.sleep(0.05)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        # The follower takes over the load instead of failing with the
+        # leader's cancellation.
+        return await follower
+
+    assert asyncio.run(main()) == "value"
+    assert load.calls == 2
+
+
+def test_async_cancelled_follower():
+    cache = ResultCache()
+    load = SlowLoad()
+
+    async def main():
+        leader = asyncio.create_task(
+            cache.get_async(KEY, load.load_async, generation_async)
+        )
+        await asyncio.sleep(0.05)
+        follower = asyncio.create_task(
+            cache.get_async(KEY, load.load_async, generation_async)
+        )
+        await asyncio.sleep(0.05)
+        follower.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await follower
+        return await leader
+
+    assert asyncio.run(main()) == "value"
+    assert load.calls == 1
+
+
+def test_shared_dir(tmp_path):
+    # Two caches stand in for two worker processes; file locks are held per
+    # open file, so they exclude each other within one process too.
+    frame = DataFrame({"year": [2014, 2014], "month": [1, 2], "total": [1.5, None]})
+    loads = [SlowLoad(frame), SlowLoad(frame)]
+    caches = [ResultCache(shared_dir=tmp_path) for _ in loads]
+
+    with ThreadPoolExecutor(2) as pool:
+        results = list(
+            pool.map(lambda i: caches[i].get(KEY, loads[i], generation), range(2))
+        )
+    for result in results:
+        assert_frame_equal(result, frame)
+    assert sum(load.calls for load in loads) == 1
+
+    names = sorted(path.suffix for path in tmp_path.iterdir())
+    assert names == [".feather", ".lock"]
+
+
+def test_shared_dir_new_generation(tmp_path):
+    frame = DataFrame({"total": [1.0]})
+    cache = ResultCache(check_interval=0, shared_dir=tmp_path)
+    cache.get(KEY, lambda: frame, generation)
+    cache.get(KEY, lambda: frame, lambda: 2)
+
+    names = sorted(path.name.split("-")[0] for path in tmp_path.glob("*.feather"))
+    assert names == ["2"]
+    # Lock files outlive generations, other workers may be waiting on them.
+    assert len(list(tmp_path.glob("*.lock"))) == 1
+
+
+def test_shared_dir_skips_other_values(tmp_path):
+    cache = ResultCache(shared_dir=tmp_path)
+    assert cache.get(KEY, lambda: ["2014"], generation) == ["2014"]
+    assert not list(tmp_path.glob("*.feather"))
@@ -0,0 +1,83 @@
+import csv
+import io
+
+import pyarrow
+from pyarrow import parquet
+
+from tests.conftest import loan_rate
+
+
+def test_csv(client):
+    response = client.get("/export/household_loans/TOTAL.csv?start=2013-11&end=2014-02")
+    assert response.status_code == 200
+    assert response.mimetype == "text/csv"
+    assert (
+        "household_loans-TOTAL-2013-11-2014-02.csv"
+        in (response.headers["Content-Disposition"])
+    )
+    header, *rows = csv.reader(io.StringIO(response.get_data(as_text=True)))
+    assert header[:3] == ["year", "month", "total"]
+    assert [(row[0], row[1]) for row in rows] == [
+        ("2013", "11"),
+        ("2013", "12"),
+        ("2014", "1"),
+        ("2014", "2"),
+    ]
+    assert float(rows[0][2]) == loan_rate(2013, 11)
+
+
+def test_empty_range_has_header(client):
+    response = client.get("/export/household_loans/TOTAL.csv?start=2020-01&end=2020-12")
+    assert response.status_code == 200
+    lines = response.get_data(as_text=True).splitlines()
+    assert len(lines) == 1
+    assert lines[0].startswith("year,month,total")
+
+
+def test_full_history_by_default(client):
+    response = client.get("/export/household_loans/HOUSING_LOANS.csv")
+    rows = response.get_data(as_text=True).splitlines()[1:]
+    assert len(rows) == 3 * 12 - 1
+
+
+def test_parquet(client):
+    response = client.get(
+        "/export/household_loans/TOTAL.parquet?start=2014-01&end=2014-12"
+    )
+    assert response.status_code == 200
+    table = parquet.read_table(io.BytesIO(response.get_data()))
+    assert table.num_rows == 12
+    assert table.schema.field("year").type == pyarrow.int64()
+    assert table.column("total").to_pylist()[0] == loan_rate(2014, 1)
+
+
+def test_arrow(client):
+    response = client.get("/export/household_term_deposits/TOTAL.arrow")
+    assert response.status_code == 200
+    table = pyarrow.ipc.open_stream(response.get_data()).read_all()
+    assert table.num_rows == 36
+    assert set(table.column("total").to_pylist()) == {2.0}
+
+
+def test_etag(client):
+    url = "/export/household_loans/TOTAL.csv?start=2014-01&end=2014-12"
+    etag = client.get(url).headers["ETag"]
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    other = client.get(
+        "/export/household_loans/TOTAL.parquet?start=2014-01&end=2014-12"
+    )
+    assert other.headers["ETag"] != etag
+
+
+def test_not_found(client):
+    assert client.get("/export/household_loans_yoy/TOTAL.csv").status_code == 404
+    assert client.get("/export/household_loans/UNKNOWN.csv").status_code == 404
+    assert client.get("/export/household_loans/CASH_LOANS.csv").status_code == 404
+    assert client.get("/export/household_loans/TOTAL.xlsx").status_code == 404
+
+
+def test_bad_period(client):
+    response = client.get("/export/household_loans/TOTAL.csv?start=2014-13")
+    assert response.status_code == 400
@@ -0,0 +1,132 @@
+import asyncio
+import os
+import uuid
+
+import pytest
+import sqlalchemy
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from src.db import Base
+from src.db.household import HouseholdTermDeposits
+from tests.conftest import cell, sheet
+
+# Runs against a real Postgres, in a throwaway schema rolled back at the end,
+# e.g. TEST_DATABASE_URL=postgresql+asyncpg://postgres@localhost:5432/postgres
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+pytestmark = pytest.mark.skipif(
+    not TEST_DATABASE_URL, reason="TEST_DATABASE_URL is not set"
+)
+
+LAYOUT = HouseholdTermDeposits.layout
+MONTHS = [(2023, month) for month in range(1, 13)]
+
+
+def revised(year, month, column):
+    return cell(year, month, column) + 1
+
+
+async def load(session, frame, revision_window=None):
+    session.info.pop("incremental", None)
+    if revision_window is not None:
+        session.info["incremental"] = True
+        session.info["revision_window"] = revision_window
+    rows = await HouseholdTermDeposits.process_frame(session, frame)
+    await session.flush()
+    return rows
+
+
+async def totals(session):
+    # The read model view is built by the ETL after loading.
+    table = HouseholdTermDeposits.read_model_query().subquery()
+    query = (
+        sqlalchemy.select(
+            table.c.year, table.c.month, table.c["local_rates.non_indexed"]
+        )
+        .where(table.c.purpose == "UP_TO_ONE")
+        .order_by(table.c.year, table.c.month)
+    )
+    return {
+        (year, month): value
+        for year, month, value in (await session.execute(query)).all()
+    }
+
+
+def run(test):
+    async def main():
+        engine = create_async_engine(TEST_DATABASE_URL)
+        try:
+            async with engine.connect() as connection:
+                transaction = await connection.begin()
+                schema = f"test_{uuid.uuid4().hex}"
+                await connection.exec_driver_sql(f"CREATE SCHEMA {schema}")
+                await connection.exec_driver_sql(f"SET LOCAL search_path TO {schema}")
+                await connection.run_sync(Base.metadata.create_all)
+                try:
+                    async with AsyncSession(bind=connection) as session:
+                        await test(session)
+                finally:
+                    await transaction.rollback()
+        finally:
+            await engine.dispose()
+
+    asyncio.run(main())
+
+
+def test_full_load():
+    async def test(session):
+        assert await load(session, sheet(MONTHS, LAYOUT.width)) == 4 * 12
+        loaded = await totals(session)
+        assert len(loaded) == 12
+        assert loaded[(2023, 5)] == cell(2023, 5, 14)
+
+    run(test)
+
+
+def test_incremental_load():
+    async def test(session):
+        await load(session, sheet(MONTHS, LAYOUT.width))
+
+        # The next publication revises every month and adds one more, but
+        # only the last stored month and the new one are re-loaded.
+        months = [*MONTHS, (2024, 1)]
+        frame = sheet(months, LAYOUT.width, revised)
+        assert await load(session, frame, revision_window=1) == 4 * 2
+
+        loaded = await totals(session)
+        assert len(loaded) == 13
+        assert loaded[(2023, 11)] == cell(2023, 11, 14)
+        assert loaded[(2023, 12)] == revised(2023, 12, 14)
+        assert loaded[(2024, 1)] == revised(2024, 1, 14)
+
+    run(test)
+
+
+def test_incremental_load_without_window():
+    async def test(session):
+        await load(session, sheet(MONTHS, LAYOUT.width))
+        frame = sheet([*MONTHS, (2024, 1)], LAYOUT.width, revised)
+        assert await load(session, frame, revision_window=0) == 4
+
+        loaded = await totals(session)
+        assert loaded[(2023, 12)] == cell(2023, 12, 14)
+        assert loaded[(2024, 1)] == revised(2024, 1, 14)
+
+    run(test)
+
+
+def test_rate_rows_are_shared():
+    # Identical rate rows are stored once, whichever purpose or month they
+    # belong to.
+    def value(year, month, column):
+        return float(column % 13)
+
+    async def test(session):
+        await load(session, sheet(MONTHS, LAYOUT.width, value))
+        count = await session.execute(
+            sqlalchemy.select(sqlalchemy.func.count()).select_from(
+                Base.metadata.tables["local_interest_rates"]
+            )
+        )
+        assert count.scalar() <= 4
+
+    run(test)
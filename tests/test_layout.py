@@ -0,0 +1,80 @@
+import math
+
+import openpyxl
+import pytest
+
+from src.db.household import HouseholdTermDeposits
+from src.db.layout import LayoutError
+from src.etl.workbook import read_sheet
+from tests.conftest import cell, sheet
+
+LAYOUT = HouseholdTermDeposits.layout
+MONTHS = [(2023, month) for month in range(10, 13)] + [(2024, 1), (2024, 2)]
+
+
+def test_extract():
+    blocks = {
+        block.purpose.name: records
+        for block, records in LAYOUT.extract(sheet(MONTHS, LAYOUT.width))
+    }
+    assert list(blocks) == ["TOTAL", "UP_TO_ONE", "ONE_UP_TO_TWO", "OVER_TWO"]
+
+    records = blocks["UP_TO_ONE"]
+    assert list(records.columns[:3]) == ["year", "month", "purpose"]
+    assert records.shape == (len(MONTHS), 3 + 13)
+    assert list(zip(records["year"], records["month"])) == MONTHS
+    assert set(records["purpose"]) == {"UP_TO_ONE"}
+    assert list(records.iloc[0, 3:]) == [cell(2023, 10, c) for c in range(14, 27)]
+
+
+def test_missing_group_is_nan():
+    records = next(LAYOUT.extract(sheet(MONTHS, LAYOUT.width)))[1]
+    assert records.iloc[-1, 3] == cell(2024, 2, 2)
+    assert all(math.isnan(value) for value in records.iloc[:, -1])
+
+
+def test_rows_without_month_are_skipped():
+    frame = sheet(MONTHS, LAYOUT.width)
+    frame.loc[len(frame)] = ["Napomena", None, *([None] * (LAYOUT.width - 2))]
+    records = next(LAYOUT.extract(frame))[1]
+    assert len(records) == len(MONTHS)
+
+
+def test_narrow_sheet():
+    with pytest.raises(LayoutError, match="layout needs 53"):
+        list(LAYOUT.extract(sheet(MONTHS, 40)))
+
+
+def test_empty_block():
+    def value(year, month, column):
+        return "-" if column >= 40 else cell(year, month, column)
+
+    with pytest.raises(LayoutError, match="OVER_TWO"):
+        list(LAYOUT.extract(sheet(MONTHS, LAYOUT.width, value)))
+
+
+def test_streamed_narrow_workbook(tmp_path):
+    # The streamed reader pads rows to the requested width, which must not
+    # hide a sheet that lost columns.
+    workbook = openpyxl.Workbook()
+    for row in sheet(MONTHS, 40).itertuples(index=False):
+        workbook.active.append(list(row))
+    path = tmp_path / "narrow.xlsx"
+    workbook.save(path)
+
+    frame = read_sheet(path, 0, LAYOUT.width)
+    assert frame.shape == (len(MONTHS) + 1, 40)
+    with pytest.raises(LayoutError):
+        LAYOUT.validate_width(frame)
+
+
+def test_streamed_workbook(tmp_path):
+    workbook = openpyxl.Workbook()
+    for row in sheet(MONTHS, LAYOUT.width).itertuples(index=False):
+        workbook.active.append(list(row))
+    path = tmp_path / "wide.xlsx"
+    workbook.save(path)
+
+    blocks = list(LAYOUT.extract(read_sheet(path, 0, LAYOUT.width)))
+    records = blocks[-1][1]
+    assert list(records.iloc[-1, 3:]) == [cell(2024, 2, c) for c in range(40, 53)]
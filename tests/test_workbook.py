@@ -0,0 +1,102 @@
+import hashlib
+
+import pytest
+
+from src.etl.workbook import Manifest, download
+
+NAME = "kamatne_stope.xlsx"
+
+
+@pytest.fixture
+def fetch(workbook_server, tmp_path):
+    manifest = Manifest(tmp_path)
+
+    def fetch(force_download=False):
+        workbook_server.requests.clear()
+        return download(
+            f"{workbook_server.base_url}/{NAME}", manifest, tmp_path, force_download
+        )
+
+    fetch.manifest = manifest
+    return fetch
+
+
+def publish(server, content: bytes, etag: str):
+    server.files[f"/{NAME}"] = (content, etag)
+
+
+def mark_loaded(fetch, sha256):
+    fetch.manifest.update(NAME, loaded_sha256=sha256)
+
+
+def test_first_download(workbook_server, fetch, tmp_path):
+    publish(workbook_server, b"first", '"1"')
+    downloaded = fetch()
+    assert downloaded.changed
+    assert downloaded.path == tmp_path / NAME
+    assert downloaded.path.read_bytes() == b"first"
+    assert downloaded.sha256 == hashlib.sha256(b"first").hexdigest()
+    assert "If-None-Match" not in workbook_server.requests[0]
+
+    entry = Manifest(tmp_path).get(NAME)
+    assert entry["etag"] == '"1"'
+    assert entry["size"] == len(b"first")
+
+
+def test_not_modified(workbook_server, fetch):
+    publish(workbook_server, b"first", '"1"')
+    mark_loaded(fetch, fetch().sha256)
+
+    downloaded = fetch()
+    headers = workbook_server.requests[0]
+    assert headers["If-None-Match"] == '"1"'
+    assert headers["If-Modified-Since"] == "Mon, 01 Jan 2024 00:00:00 GMT"
+    assert not downloaded.changed
+    assert downloaded.sha256 == hashlib.sha256(b"first").hexdigest()
+
+
+def test_not_loaded_yet(workbook_server, fetch):
+    # A 304 for a file the last run downloaded but failed to load.
+    publish(workbook_server, b"first", '"1"')
+    fetch()
+    assert fetch().changed
+
+
+def test_modified(workbook_server, fetch):
+    publish(workbook_server, b"first", '"1"')
+    mark_loaded(fetch, fetch().sha256)
+
+    publish(workbook_server, b"second", '"2"')
+    downloaded = fetch()
+    assert downloaded.changed
+    assert downloaded.path.read_bytes() == b"second"
+
+
+def test_same_content_new_etag(workbook_server, fetch):
+    publish(workbook_server, b"first", '"1"')
+    mark_loaded(fetch, fetch().sha256)
+
+    publish(workbook_server, b"first", '"2"')
+    assert not fetch().changed
+    assert fetch.manifest.get(NAME)["etag"] == '"2"'
+
+
+def test_truncated_cache_downloads_again(workbook_server, fetch, tmp_path):
+    publish(workbook_server, b"first", '"1"')
+    mark_loaded(fetch, fetch().sha256)
+
+    (tmp_path / NAME).write_bytes(b"fir")
+    downloaded = fetch()
+    assert "If-None-Match" not in workbook_server.requests[0]
+    assert downloaded.path.read_bytes() == b"first"
+    assert not downloaded.changed
+
+
+def test_force_download(workbook_server, fetch):
+    publish(workbook_server, b"first", '"1"')
+    mark_loaded(fetch, fetch().sha256)
+
+    downloaded = fetch(force_download=True)
+    assert "If-None-Match" not in workbook_server.requests[0]
+    assert "If-Modified-Since" not in workbook_server.requests[0]
+    assert downloaded.changed